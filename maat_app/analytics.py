@@ -0,0 +1,126 @@
+import numpy as np
+from .archive import response_values
+from .models import Participant, Trial
+
+OUTLIER_SD = 2.5
+TRIM_PROPORTION = 0.1
+GROUP_BY = ['block_name', 'valence', 'movement', 'participant']
+
+# Integer ids only (25 bytes a row); trial attributes and subject ids are
+# looked up once per distinct id and only turned into labels after grouping
+RESPONSE_DTYPE = np.dtype([
+    ('participant', np.int64),
+    ('trial', np.int64),
+    ('response_time', np.float64),
+    ('accuracy', np.int8),
+])
+
+
+def load_experiment_arrays(experiment):
+    """Read an experiment's archived and live responses into a structured NumPy array."""
+    rows = response_values(
+        ['participant_id', 'trial_id', 'response_time', 'accuracy'],
+        experiment.pk, live_only=True, chunk_size=10000
+    )
+    return np.fromiter(rows, dtype=RESPONSE_DTYPE)
+
+
+def labelled_codes(index, values):
+    """Codes into the sorted distinct values, for responses pointing at values by index."""
+    labels, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+    return codes[index], labels.tolist()
+
+
+def group_codes(data):
+    """
+    Per-response integer codes for each GROUP_BY field, with the labels the
+    codes stand for (None where the codes are the values themselves).
+    """
+    trial_ids, trial_index = np.unique(data['trial'], return_inverse=True)
+    trials = Trial.objects.in_bulk(trial_ids.tolist())
+    participant_ids, participant_index = np.unique(data['participant'], return_inverse=True)
+    subject_ids = dict(Participant.all_objects.filter(pk__in=participant_ids.tolist()).values_list('pk', 'subject_id'))
+    codes = {
+        'block_name': labelled_codes(trial_index, [trials[pk].block_name for pk in trial_ids.tolist()]),
+        'participant': labelled_codes(participant_index, [subject_ids[pk] for pk in participant_ids.tolist()]),
+    }
+    for field in ('valence', 'movement'):
+        values = np.array([getattr(trials[pk], field) for pk in trial_ids.tolist()], dtype=np.int64)
+        codes[field] = (values[trial_index], None)
+    return codes
+
+
+def sd_outliers(response_time, participant, threshold=OUTLIER_SD):
+    """Flag responses more than threshold SDs from their participant's mean RT."""
+    _, inverse = np.unique(participant, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=response_time) / counts
+    deviations = response_time - means[inverse]
+    variances = np.bincount(inverse, weights=deviations ** 2) / np.maximum(counts - 1, 1)
+    return np.abs(deviations) > threshold * np.sqrt(variances)[inverse]
+
+
+def group_summary(keys, response_time, accuracy, outliers, trim=TRIM_PROPORTION, labels=None):
+    """
+    Per-group RT and accuracy statistics, computed with one sort plus
+    bincount/cumsum instead of looping over groups in Python. With labels,
+    integer keys are reported as labels[key].
+    """
+    groups, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(groups))
+    means = np.bincount(inverse, weights=response_time) / counts
+    deviations = response_time - means[inverse]
+    sds = np.sqrt(np.bincount(inverse, weights=deviations ** 2) / np.maximum(counts - 1, 1))
+
+    # Sort by group, then RT, so each group is a contiguous ascending run
+    order = np.lexsort((response_time, inverse))
+    sorted_rt = response_time[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = (sorted_rt[starts + (counts - 1) // 2] + sorted_rt[starts + counts // 2]) / 2
+
+    cut = np.floor(counts * trim).astype(np.int64)
+    cumulative = np.concatenate(([0.0], np.cumsum(sorted_rt)))
+    trimmed_means = (cumulative[starts + counts - cut] - cumulative[starts + cut]) / (counts - 2 * cut)
+
+    accuracy_rates = np.bincount(inverse, weights=accuracy) / counts
+    outlier_counts = np.bincount(inverse, weights=outliers).astype(np.int64)
+
+    return [
+        {
+            'key': group.item() if labels is None else labels[group.item()],
+            'n': int(n),
+            'mean_rt': float(mean),
+            'median_rt': float(median),
+            'trimmed_mean_rt': float(trimmed),
+            'sd_rt': float(sd),
+            'accuracy': float(rate),
+            'outliers': int(outlier_count),
+        }
+        for group, n, mean, median, trimmed, sd, rate, outlier_count in zip(
+            groups, counts, means, medians, trimmed_means, sds, accuracy_rates, outlier_counts
+        )
+    ]
+
+
+def summarize_experiment(experiment, outlier_sd=OUTLIER_SD, trim=TRIM_PROPORTION):
+    data = load_experiment_arrays(experiment)
+    summary = {
+        'experiment_id': experiment.experiment_id,
+        'n_responses': int(len(data)),
+        'outlier_sd': outlier_sd,
+        'trim_proportion': trim,
+        'groups': {},
+    }
+    if not len(data):
+        return summary
+
+    response_time = data['response_time']
+    accuracy = data['accuracy'].astype(np.float64)
+    codes = group_codes(data)
+    outliers = sd_outliers(response_time, codes['participant'][0], outlier_sd)
+    summary['overall'] = group_summary(np.zeros(len(data), dtype=np.int8), response_time, accuracy, outliers, trim)[0]
+    del summary['overall']['key']
+    for field in GROUP_BY:
+        keys, labels = codes[field]
+        summary['groups'][field] = group_summary(keys, response_time, accuracy, outliers, trim, labels)
+    return summary
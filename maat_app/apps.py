@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MaatAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'maat_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
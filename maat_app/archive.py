@@ -0,0 +1,239 @@
+import heapq
+import io
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+from django.db import transaction
+from .models import Experiment, Participant, Response as ParticipantResponse, ResponseArchive, Trial
+
+# Responses of completed experiments are moved from the Response table (the
+# hot tier, which live sessions write to) into ResponseArchive parts (the
+# cold tier) of up to ARCHIVE_CHUNK_SIZE responses. A part holds one array
+# per column, compressed together; trials are stored once per part and each
+# response keeps an index into them. response_values() reads both tiers.
+
+ARCHIVE_CHUNK_SIZE = 100000
+ARCHIVE_SOURCE_FIELDS = ['id', 'participant_id', 'trial_id', 'response_time', 'accuracy', 'client_timestamp']
+# client_timestamp is stored as microseconds since the epoch, with this for None
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+class ArchiveConflict(Exception):
+    pass
+
+
+def pack_responses(rows):
+    """Pack (id, participant_id, trial_id, response_time, accuracy, client_timestamp) rows, in id order."""
+    response_ids, participant_ids, trial_ids, response_times, accuracies, timestamps = zip(*rows)
+    trials, trial_index = np.unique(np.array(trial_ids, dtype=np.int64), return_inverse=True)
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        response_id=np.array(response_ids, dtype=np.int64),
+        participant_id=np.array(participant_ids, dtype=np.int64),
+        trial_ids=trials,
+        trial_index=trial_index.astype(np.int32),
+        response_time=np.array(response_times, dtype=np.float64),
+        accuracy=np.array(accuracies, dtype=np.int8),
+        client_timestamp=np.array([
+            NO_TIMESTAMP if timestamp is None else round(timestamp.timestamp() * 1000000) for timestamp in timestamps
+        ], dtype=np.int64),
+    )
+    return buffer.getvalue()
+
+
+def unpack_responses(data):
+    with np.load(io.BytesIO(bytes(data))) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+def archive_experiment(experiment, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Move the experiment's responses into ResponseArchive parts, one
+    transaction per part, and return how many were moved. Responses that
+    arrive later are picked up by the next call.
+    """
+    moved = 0
+    while True:
+        try:
+            with transaction.atomic():
+                rows = list(ParticipantResponse.objects.filter(experiment_id=experiment.pk).order_by('id').values_list(
+                    *ARCHIVE_SOURCE_FIELDS
+                )[:chunk_size])
+                if not rows:
+                    return moved
+                first_id, last_id = rows[0][0], rows[-1][0]
+                ResponseArchive.objects.create(
+                    experiment_id=experiment.pk,
+                    first_response_id=first_id,
+                    last_response_id=last_id,
+                    response_count=len(rows),
+                    data=pack_responses(rows),
+                )
+                # A range keeps the DELETE short; a row committed into it meanwhile rolls the part back
+                deleted, _ = ParticipantResponse.objects.filter(
+                    experiment_id=experiment.pk, id__gte=first_id, id__lte=last_id
+                ).delete()
+                if deleted != len(rows):
+                    raise ArchiveConflict
+        except ArchiveConflict:
+            continue
+        moved += len(rows)
+
+
+def archive_completed(experiment_ids=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Archive every completed experiment that still has responses in the hot tier; returns {experiment: moved}."""
+    experiments = Experiment.objects.filter(completed_at__isnull=False)
+    if experiment_ids is not None:
+        experiments = experiments.filter(pk__in=experiment_ids)
+    pending = ParticipantResponse.objects.filter(experiment_id__in=experiments.values('pk')).values_list(
+        'experiment_id', flat=True
+    ).distinct()
+    return {
+        experiment: archive_experiment(experiment, chunk_size)
+        for experiment in Experiment.objects.filter(pk__in=list(pending)).order_by('pk')
+    }
+
+
+def part_participant_ids(data):
+    # An .npz member is only decompressed when read, so this skips the other columns
+    with np.load(io.BytesIO(bytes(data))) as arrays:
+        return arrays['participant_id']
+
+
+def remove_archived_participant(participant_id):
+    """
+    Rewrite the archive parts holding the participant's responses without
+    them. Parts are found from their own participant columns, since older
+    responses have no ParticipantRun pointing at their experiment.
+    """
+    parts = ResponseArchive.objects.order_by('pk').values_list('pk', 'data').iterator(chunk_size=100)
+    affected = [pk for pk, data in parts if (part_participant_ids(data) == participant_id).any()]
+    for part_id in affected:
+        with transaction.atomic():
+            part = ResponseArchive.objects.select_for_update().get(pk=part_id)
+            columns = unpack_responses(part.data)
+            keep = columns['participant_id'] != participant_id
+            if keep.all():
+                continue
+            if not keep.any():
+                part.delete()
+                continue
+            rows = zip(
+                columns['response_id'][keep].tolist(),
+                columns['participant_id'][keep].tolist(),
+                columns['trial_ids'][columns['trial_index'][keep]].tolist(),
+                columns['response_time'][keep].tolist(),
+                columns['accuracy'][keep].tolist(),
+                decode_timestamps(columns['client_timestamp'][keep]),
+            )
+            part.data = pack_responses(list(rows))
+            part.response_count = int(keep.sum())
+            part.first_response_id = int(columns['response_id'][keep][0])
+            part.last_response_id = int(columns['response_id'][keep][-1])
+            part.save()
+
+
+def decode_timestamps(values):
+    return [
+        None if value == NO_TIMESTAMP else datetime.fromtimestamp(value / 1000000, tz=dt_timezone.utc)
+        for value in values.tolist()
+    ]
+
+
+def related_values(model, field, ids, manager='objects'):
+    return dict(getattr(model, manager).filter(pk__in=ids).values_list('pk', field))
+
+
+def part_rows(part_id, experiment, fields, participant_ids=None, after_id=0, live_only=False):
+    """
+    values_list-style tuples from one archive part. Supports the Response
+    columns, trial_id and participant_id, and trial__x, participant__x and
+    experiment__x lookups of one level.
+    """
+    columns = unpack_responses(ResponseArchive.objects.values_list('data', flat=True).get(pk=part_id))
+    # Drop responses of participants that are deleted (or, with live_only, waiting to be)
+    participants = Participant.objects if live_only else Participant.all_objects
+    existing = np.array(list(participants.filter(
+        pk__in=np.unique(columns['participant_id']).tolist()
+    ).values_list('pk', flat=True)), dtype=np.int64)
+    # and, as the Trial cascade does in the hot tier, responses to deleted trials
+    trials_left = np.isin(columns['trial_ids'], np.array(list(Trial.objects.filter(
+        pk__in=columns['trial_ids'].tolist()
+    ).values_list('pk', flat=True)), dtype=np.int64))
+    keep = np.isin(columns['participant_id'], existing) & trials_left[columns['trial_index']] & (columns['response_id'] > after_id)
+    if participant_ids is not None:
+        keep &= np.isin(columns['participant_id'], np.array(list(participant_ids), dtype=np.int64))
+    if not keep.any():
+        return
+
+    participant_id = columns['participant_id'][keep]
+    trial_id = columns['trial_ids'][columns['trial_index'][keep]]
+    values = []
+    for field in fields:
+        if field == 'id':
+            values.append(columns['response_id'][keep].tolist())
+        elif field == 'participant_id':
+            values.append(participant_id.tolist())
+        elif field == 'trial_id':
+            values.append(trial_id.tolist())
+        elif field == 'experiment_id':
+            values.append([experiment.pk] * len(participant_id))
+        elif field in ('response_time', 'accuracy'):
+            values.append(columns[field][keep].tolist())
+        elif field == 'client_timestamp':
+            values.append(decode_timestamps(columns['client_timestamp'][keep]))
+        elif field.startswith('trial__'):
+            lookup = related_values(Trial, field.removeprefix('trial__'), columns['trial_ids'].tolist())
+            values.append([lookup.get(pk) for pk in trial_id.tolist()])
+        elif field.startswith('participant__'):
+            lookup = related_values(Participant, field.removeprefix('participant__'), existing.tolist(), 'all_objects')
+            values.append([lookup[pk] for pk in participant_id.tolist()])
+        elif field.startswith('experiment__'):
+            values.append([getattr(experiment, field.removeprefix('experiment__'))] * len(participant_id))
+        else:
+            raise ValueError(f'Archived responses have no {field} column')
+    yield from zip(*values)
+
+
+def archived_rows(fields, experiment_id=None, participant_ids=None, after_id=0, live_only=False):
+    """Rows of the archived responses in id order; fields must start with 'id'."""
+    parts = ResponseArchive.objects.filter(last_response_id__gt=after_id)
+    if experiment_id is not None:
+        parts = parts.filter(experiment_id=experiment_id)
+    by_experiment = defaultdict(list)
+    for part_id, part_experiment_id in parts.order_by('first_response_id').values_list('id', 'experiment_id'):
+        by_experiment[part_experiment_id].append(part_id)
+    experiments = Experiment.all_objects.in_bulk(list(by_experiment))
+    # An experiment's parts cover disjoint id ranges, so each chain is in id
+    # order; parts are only decoded once the merge reaches them
+    streams = [
+        chain.from_iterable(
+            part_rows(part_id, experiments[pk], fields, participant_ids, after_id, live_only) for part_id in part_ids
+        )
+        for pk, part_ids in by_experiment.items()
+    ]
+    return heapq.merge(*streams, key=itemgetter(0))
+
+
+def response_values(fields, experiment_id=None, participant_ids=None, after_id=0, live_only=False, chunk_size=2000):
+    """
+    Response values_list tuples from both tiers, in response id order. With
+    live_only, responses of soft-deleted participants are left out.
+    """
+    hot = ParticipantResponse.objects.filter(id__gt=after_id)
+    if experiment_id is not None:
+        hot = hot.filter(experiment_id=experiment_id)
+    if participant_ids is not None:
+        hot = hot.filter(participant_id__in=participant_ids)
+    if live_only:
+        hot = hot.filter(participant__deleted_at__isnull=True)
+    merged = heapq.merge(
+        archived_rows(['id', *fields], experiment_id, participant_ids, after_id, live_only),
+        hot.order_by('id').values_list('id', *fields).iterator(chunk_size=chunk_size),
+        key=itemgetter(0),
+    )
+    return (row[1:] for row in merged)
+
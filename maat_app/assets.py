@@ -0,0 +1,118 @@
+import hashlib
+import os
+import re
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import storages
+from django.urls import reverse
+from .models import StimulusAsset
+
+# Served from the app's own origin, so SVG (which can carry script) is not accepted
+ASSET_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.m4a': 'audio/mp4',
+}
+# A file's URL changes with its content, so browsers may keep it forever
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def asset_storage():
+    return storages['stimulus_assets']
+
+
+def asset_path(sha256, extension):
+    return f'{sha256[:2]}/{sha256}{extension}'
+
+
+def store_asset(upload):
+    """
+    Store an uploaded image or audio file under its SHA-256 unless the same
+    content is already stored. Returns (asset, created).
+    """
+    extension = os.path.splitext(upload.name)[1].lower()
+    content_type = ASSET_TYPES.get(extension)
+    if content_type is None:
+        raise ValidationError(f'{upload.name}: only {", ".join(sorted(ASSET_TYPES))} files can be used as stimuli')
+    if upload.size > settings.MAAT_ASSET_MAX_BYTES:
+        raise ValidationError(f'{upload.name}: larger than {settings.MAAT_ASSET_MAX_BYTES // (1024 * 1024)} MB')
+
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    sha256 = digest.hexdigest()
+    asset = StimulusAsset.objects.filter(sha256=sha256).first()
+    if asset is not None:
+        return asset, False
+
+    storage = asset_storage()
+    path = asset_path(sha256, extension)
+    if not storage.exists(path):
+        upload.seek(0)
+        storage.save(path, upload)
+    return StimulusAsset.objects.get_or_create(sha256=sha256, defaults={
+        'extension': extension,
+        'content_type': content_type,
+        'size': upload.size,
+        'original_name': upload.name[:255],
+    })
+
+
+def open_asset(file_name):
+    """The stored file and content type for an asset URL name, or None."""
+    sha256, extension = os.path.splitext(file_name)
+    if not SHA256_PATTERN.match(sha256) or extension not in ASSET_TYPES:
+        return None
+    try:
+        return asset_storage().open(asset_path(sha256, extension)), ASSET_TYPES[extension]
+    except FileNotFoundError:
+        return None
+
+
+def trial_asset(trial):
+    """The URL and kind ('image' or 'audio') of a cached trial's media stimulus, or None for text."""
+    if trial.asset_sha256 is None:
+        return None
+    return {
+        'url': reverse('stimulus_asset', args=[f'{trial.asset_sha256}{trial.asset_extension}']),
+        'kind': trial.asset_content_type.split('/')[0],
+    }
+
+
+def trial_payload(trial):
+    return {
+        'id': trial.id,
+        'stimuli': trial.stimuli,
+        'random_fixation': trial.random_fixation,
+        'asset': trial_asset(trial),
+    }
+
+
+def run_trial_payload(state, trials, cursor):
+    """
+    What the single-trial page needs. On a run's first trial this includes
+    every media asset of the run, so the page can load them all before the
+    first onset; later pages find them in the browser cache.
+    """
+    payload = {
+        'trial': trial_payload(trials[state['trial_ids'][cursor]]),
+        'cursor': cursor,
+        'params': state['params'],
+        'preload': [],
+    }
+    if cursor == 0:
+        urls = {}
+        for trial_id in state['trial_ids']:
+            trial = trials.get(trial_id)
+            asset = trial_asset(trial) if trial is not None else None
+            if asset is not None:
+                urls.setdefault(asset['url'], asset)
+        payload['preload'] = list(urls.values())
+    return payload
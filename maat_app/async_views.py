@@ -0,0 +1,88 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
+from django.views.decorators.csrf import csrf_exempt
+from .assets import run_trial_payload
+from .rendering import render_trial_page
+from .export_queue import aenqueue_export
+from .metadata import aexperiment_trials, trial_or_404
+from .models import Experiment, Participant
+from .runs import acomplete_run, arecord_response, arun_cursor, arun_state
+
+# Async versions of the participant hot path, routed instead of the sync views
+# in maat_app.views when MAAT_ASYNC_VIEWS is set and the app is served over ASGI.
+# The database-backed session has no async API in Django 5.0, so session reads
+# go through sync_to_async.
+
+
+async def session_run_id(request):
+    return await sync_to_async(request.session.get)('run_id')
+
+
+async def session_run_state(request):
+    run_id = await session_run_id(request)
+    state = await arun_state(run_id) if run_id else None
+    return run_id, state
+
+
+# Participant Login View
+async def participant_login(request):
+    if request.method == 'POST':
+        participant_id = request.POST.get('participant_id')
+        experiment_id = request.POST.get('experiment_id')
+        try:
+            participant = await Participant.objects.aget(subject_id=participant_id)
+            experiment = await Experiment.objects.aget(experiment_id=experiment_id)
+            if experiment.completed_at is not None:
+                return render(request, 'participant_login.html', {'error': 'This experiment has ended'})
+            return redirect('show_instructions', participant_id=participant.id, experiment_id=experiment.id)
+        except Participant.DoesNotExist:
+            return render(request, 'participant_login.html', {'error': 'Invalid Participant ID'})
+        except Experiment.DoesNotExist:
+            return render(request, 'participant_login.html', {'error': 'Invalid Experiment ID'})
+    return render(request, 'participant_login.html')
+
+# Display Trial View
+async def run_trial(request):
+    run_id, state = await session_run_state(request)
+    if state is None:
+        return redirect('participant_login')
+
+    current_trial_index = await arun_cursor(run_id)
+    trial_ids = state['trial_ids']
+
+    if current_trial_index >= len(trial_ids):
+        return redirect('experiment_complete')
+
+    trials = await aexperiment_trials(state['experiment_id'])
+    trial_or_404(trials, trial_ids[current_trial_index])
+    return render_trial_page(request, 'experiment.html', run_trial_payload(state, trials, current_trial_index))
+
+# Capture Response View
+@csrf_exempt
+async def save_response(request):
+    if request.method == 'POST':
+        run_id, state = await session_run_state(request)
+        if state is None:
+            return redirect('participant_login')
+        current_trial_index = await arun_cursor(run_id)
+        trial_ids = state['trial_ids']
+        if current_trial_index >= len(trial_ids):
+            return redirect('experiment_complete')
+        # The form names the trial it answers; a resubmitted answer to an earlier one is dropped
+        if request.POST.get('cursor', str(current_trial_index)) != str(current_trial_index):
+            return redirect('run_trial')
+        trial = trial_or_404(await aexperiment_trials(state['experiment_id']), trial_ids[current_trial_index])
+
+        response_time = float(request.POST['response_time'])
+        response_key = request.POST['response_key']
+
+        await arecord_response(run_id, current_trial_index, state['participant_id'], trial, response_time, response_key)
+        return redirect('run_trial')
+
+# Experiment Completion View - queue the results export for the background worker
+async def experiment_complete(request):
+    run_id, state = await session_run_state(request)
+    # Only the request that completes the run queues its export, not a refresh of the page
+    if state is not None and await acomplete_run(run_id):
+        await aenqueue_export(state['participant_id'], state['experiment_id'])
+    return render(request, 'experiment_complete.html')
@@ -0,0 +1,136 @@
+import json
+import os
+import numpy as np
+from .archive import response_values
+
+# (column, queryset field, dtype); dtype None marks a categorical column stored
+# as int32 codes into a per-part array of distinct values
+COLUMNAR_SCHEMA = [
+    ('response_id', 'id', np.int64),
+    ('trial_id', 'trial_id', np.int64),
+    ('participant', 'participant__subject_id', None),
+    ('experiment', 'experiment__experiment_id', None),
+    ('block_order', 'trial__block_order', np.int32),
+    ('block_name', 'trial__block_name', None),
+    ('stimuli', 'trial__stimuli', None),
+    ('valence', 'trial__valence', np.int8),
+    ('random_fixation', 'trial__random_fixation', np.int32),
+    ('movement', 'trial__movement', np.int16),
+    ('response_time', 'response_time', np.float32),
+    ('accuracy', 'accuracy', np.int8),
+]
+
+COLUMNAR_CHUNK_SIZE = 100000
+# Ids are assigned at insert but become visible at commit, so on PostgreSQL a
+# row can appear below ids already exported; every run re-reads this many ids
+# below the cursor and picks up rows it has not written yet
+COLUMNAR_RESCAN_WINDOW = 10000
+STATE_FILENAME = '_state.json'
+
+
+def read_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'last_response_id': 0, 'recent_ids': []}
+
+
+def write_state(output_dir, state):
+    state_path = os.path.join(output_dir, STATE_FILENAME)
+    with open(f'{state_path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{state_path}.tmp', state_path)
+
+
+def encode_chunk(rows):
+    columns = {}
+    for position, (name, _, dtype) in enumerate(COLUMNAR_SCHEMA):
+        values = [row[position] for row in rows]
+        if dtype is None:
+            categories, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+            columns[name] = codes.astype(np.int32)
+            columns[f'{name}__categories'] = categories
+        else:
+            columns[name] = np.fromiter(values, dtype=dtype, count=len(values))
+    return columns
+
+
+def export_columnar(output_dir, experiment_id=None, chunk_size=COLUMNAR_CHUNK_SIZE, full=False,
+                    rescan_window=COLUMNAR_RESCAN_WINDOW):
+    """
+    Append responses (archived or live) not exported yet to output_dir as
+    typed, compressed .npz part files of up to chunk_size rows each: those
+    newer than the last exported Response.id, and those up to rescan_window
+    ids below it that committed late. Returns the number of rows written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if full:
+        for name in list_parts(output_dir):
+            os.remove(os.path.join(output_dir, name))
+        state = {'last_response_id': 0, 'recent_ids': []}
+    else:
+        state = read_state(output_dir)
+    if 'recent_ids' in state:
+        floor = max(state['last_response_id'] - rescan_window, 0)
+    else:
+        # State written before the window was kept: nothing below the cursor is known
+        floor = state['last_response_id']
+    recent = set(state.get('recent_ids', ()))
+    rows = response_values(
+        [field for _, field, _ in COLUMNAR_SCHEMA], experiment_id, after_id=floor, chunk_size=chunk_size
+    )
+
+    written = 0
+    chunk = []
+    for row in rows:
+        if row[0] in recent:
+            continue
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            written += write_part(output_dir, chunk, state, recent, rescan_window)
+            chunk = []
+    if chunk:
+        written += write_part(output_dir, chunk, state, recent, rescan_window)
+    return written
+
+
+def write_part(output_dir, rows, state, recent, rescan_window):
+    first_id, last_id = rows[0][0], rows[-1][0]
+    part_path = os.path.join(output_dir, f'part-{first_id:012d}-{last_id:012d}.npz')
+    with open(f'{part_path}.tmp', 'wb') as f:
+        np.savez_compressed(f, **encode_chunk(rows))
+    os.replace(f'{part_path}.tmp', part_path)
+    # Advance the cursor only once the part is on disk, so a failed run resumes
+    # cleanly; the ids written inside the window are kept so a re-scan skips them
+    state['last_response_id'] = max(state['last_response_id'], last_id)
+    floor = state['last_response_id'] - rescan_window
+    recent.update(row[0] for row in rows)
+    recent.difference_update([pk for pk in recent if pk <= floor])
+    state['recent_ids'] = sorted(recent)
+    write_state(output_dir, state)
+    return len(rows)
+
+
+def list_parts(output_dir):
+    return sorted(name for name in os.listdir(output_dir) if name.startswith('part-') and name.endswith('.npz'))
+
+
+def read_columnar(output_dir):
+    """
+    Load every part in output_dir into one dict of column arrays, categoricals
+    decoded. Late commits land in parts of their own, so rows are in id order
+    only within a part.
+    """
+    columns = {name: [] for name, _, _ in COLUMNAR_SCHEMA}
+    for part in list_parts(output_dir):
+        with np.load(os.path.join(output_dir, part)) as data:
+            for name, _, dtype in COLUMNAR_SCHEMA:
+                if dtype is None:
+                    columns[name].append(data[f'{name}__categories'][data[name]])
+                else:
+                    columns[name].append(data[name])
+    return {
+        name: np.concatenate(arrays) if arrays else np.array([], dtype=dtype or str)
+        for (name, _, dtype), arrays in zip(COLUMNAR_SCHEMA, columns.values())
+    }
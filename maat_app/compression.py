@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware
+
+# Images, audio and zip archives are compressed already; gzipping them again
+# costs CPU and drops Content-Length (and with it range requests)
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware (with its BREACH mitigation) for text responses only."""
+
+    def process_response(self, request, response):
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        return super().process_response(request, response)
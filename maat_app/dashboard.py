@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Experiment, Participation, Response as ParticipantResponse, ResponseArchive, Trial
+
+DASHBOARD_VERSION_KEY = 'maat:dashboard_version'
+DASHBOARD_PAGE_SIZE = 25
+# Response counts are not covered by signal invalidation (bulk_create sends no
+# signals), so cached fragments also expire after this many seconds
+DASHBOARD_CACHE_TIMEOUT = 60
+
+
+def dashboard_version():
+    return cache.get_or_set(DASHBOARD_VERSION_KEY, 1, None)
+
+
+def bump_dashboard_version():
+    try:
+        cache.incr(DASHBOARD_VERSION_KEY)
+    except ValueError:
+        cache.set(DASHBOARD_VERSION_KEY, 1, None)
+
+
+def count_subquery(queryset, experiment_field):
+    # A correlated COUNT per row avoids multiplying rows across several joins
+    counts = queryset.filter(**{experiment_field: OuterRef('pk')}).order_by().values(experiment_field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def archived_count_subquery():
+    counts = ResponseArchive.objects.filter(experiment=OuterRef('pk')).order_by().values('experiment').annotate(
+        count=Sum('response_count')
+    ).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def experiment_summaries():
+    return Experiment.objects.annotate(
+        trial_count=count_subquery(Trial.objects.all(), 'experiment'),
+        # Participants waiting for the deletion worker are already left out
+        participant_count=count_subquery(Participation.objects.filter(participant__deleted_at__isnull=True), 'experiment'),
+        response_count=count_subquery(
+            ParticipantResponse.objects.filter(participant__deleted_at__isnull=True), 'experiment'
+        ) + archived_count_subquery(),
+    ).order_by('id')
+
+
+def paginate(request, queryset, param, per_page=DASHBOARD_PAGE_SIZE):
+    """
+    Page queryset by the ?<param>= query argument. The page carries
+    previous_query/next_query strings that keep the other sections' pages.
+    """
+    page = Paginator(queryset, per_page).get_page(request.GET.get(param))
+    page.param = param
+    for attr, has_page, number in (
+        ('previous_query', page.has_previous, page.number - 1),
+        ('next_query', page.has_next, page.number + 1),
+    ):
+        query = request.GET.copy()
+        query[param] = number
+        setattr(page, attr, query.urlencode() if has_page() else '')
+    return page
@@ -0,0 +1,156 @@
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .archive import remove_archived_participant
+from .dashboard import bump_dashboard_version
+from .jobs import claim_pending, requeue, stale_jobs
+from .metadata import forget_experiment, forget_participant, forget_trials
+from .models import (
+    DeletionJob, Experiment, ExportJob, Participant, ParticipantRun, Participation, Response as ParticipantResponse,
+    RepeatedResponse, ResponseArchive, ResponseBatch, Trial, TrialSchedule
+)
+from .runs import forget_runs
+
+# Deleting an experiment or participant in the request would make Django's
+# collector load every related row first. Instead the row is soft-deleted
+# (hidden by LiveManager) and a DeletionJob is queued; the deletion worker
+# then removes the related rows children first, in short raw DELETE batches.
+
+
+def deleted_name(pk):
+    # Never a valid username, so a renamed row does not clash with a new one
+    return f'~deleted-{pk}'
+
+
+def schedule_deletion(instance):
+    """
+    Soft-delete an experiment or participant and queue its purge. Its unique
+    id (and a participant's login) is renamed so a new one can take it
+    straight away. Returns the job, or None if it was already deleted.
+    """
+    if isinstance(instance, Experiment):
+        kind, id_field, label = DeletionJob.EXPERIMENT, 'experiment_id', instance.experiment_id
+    else:
+        kind, id_field, label = DeletionJob.PARTICIPANT, 'subject_id', instance.subject_id
+    with transaction.atomic():
+        # The conditional UPDATE makes a repeated POST queue nothing
+        deleted = type(instance).all_objects.filter(pk=instance.pk, deleted_at__isnull=True).update(
+            deleted_at=timezone.now(), **{id_field: deleted_name(instance.pk)}
+        )
+        if not deleted:
+            return None
+        if kind == DeletionJob.PARTICIPANT:
+            User.objects.filter(pk=instance.user_id).update(username=deleted_name(instance.pk), is_active=False)
+        job = DeletionJob.objects.create(kind=kind, object_id=instance.pk, label=label)
+
+    if kind == DeletionJob.EXPERIMENT:
+        forget_experiment(instance.pk)
+        forget_trials(instance.pk)
+    else:
+        forget_participant(instance.pk)
+    bump_dashboard_version()
+    return job
+
+
+def purge_steps(job):
+    """
+    Querysets to empty in order. Runs go first so participants still on them
+    can no longer write responses; the soft-deleted row itself goes last.
+    """
+    if job.kind == DeletionJob.EXPERIMENT:
+        return [
+            ParticipantRun.objects.filter(experiment_id=job.object_id),
+            ParticipantResponse.objects.filter(experiment_id=job.object_id),
+            # Responses whose trial was moved here after they were recorded
+            ParticipantResponse.objects.filter(trial__experiment_id=job.object_id).exclude(experiment_id=job.object_id),
+            RepeatedResponse.objects.filter(experiment_id=job.object_id),
+            RepeatedResponse.objects.filter(trial__experiment_id=job.object_id).exclude(experiment_id=job.object_id),
+            ExportJob.objects.filter(experiment_id=job.object_id),
+            ResponseArchive.objects.filter(experiment_id=job.object_id),
+            TrialSchedule.objects.filter(experiment_id=job.object_id),
+            Participation.objects.filter(experiment_id=job.object_id),
+            Trial.objects.filter(experiment_id=job.object_id),
+            Experiment.all_objects.filter(pk=job.object_id, deleted_at__isnull=False),
+        ]
+    return [
+        ParticipantRun.objects.filter(participant_id=job.object_id),
+        ParticipantResponse.objects.filter(participant_id=job.object_id),
+        RepeatedResponse.objects.filter(participant_id=job.object_id),
+        ResponseBatch.objects.filter(participant_id=job.object_id),
+        ExportJob.objects.filter(participant_id=job.object_id),
+        Participation.objects.filter(participant_id=job.object_id),
+        Participant.all_objects.filter(pk=job.object_id, deleted_at__isnull=False),
+    ]
+
+
+def delete_batch(queryset, batch_size):
+    """Delete up to batch_size rows of queryset with one raw DELETE; returns the deleted ids."""
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if ids:
+        meta = queryset.model._meta
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(meta.db_table)} WHERE {quote(meta.pk.column)} IN ({", ".join(["%s"] * len(ids))})',
+                ids
+            )
+    return ids
+
+
+def requeue_stale():
+    """
+    Queue running jobs again whose worker stopped sending heartbeats, i.e.
+    was killed mid-purge; a purge can simply start over. Returns the count.
+    """
+    return requeue(stale_jobs(DeletionJob, 'heartbeat', settings.MAAT_DELETION_STALE_SECONDS), rows_deleted=0)
+
+
+def claim_jobs(limit=None):
+    """Mark pending jobs as running under a fresh claim token and return them, oldest first."""
+    return claim_pending(DeletionJob, 'heartbeat', limit)
+
+
+def purge(job, batch_size=None, pause=None):
+    """Run a claimed job to completion, recording progress after every batch."""
+    batch_size = batch_size or settings.MAAT_DELETION_BATCH_SIZE
+    pause = settings.MAAT_DELETION_PAUSE_SECONDS if pause is None else pause
+    # Once the job is requeued as stale, this worker's updates match nothing
+    jobs = DeletionJob.objects.filter(id=job.id, claim=job.claim)
+    try:
+        steps = purge_steps(job)
+        if job.kind == DeletionJob.PARTICIPANT:
+            remove_archived_participant(job.object_id)
+        jobs.update(rows_total=sum(queryset.count() for queryset in steps))
+        for queryset in steps:
+            while ids := delete_batch(queryset, batch_size):
+                if queryset.model is ParticipantRun:
+                    forget_runs(ids)
+                jobs.update(rows_deleted=F('rows_deleted') + len(ids), heartbeat=timezone.now())
+                if pause:
+                    time.sleep(pause)
+        if job.kind == DeletionJob.PARTICIPANT:
+            # A single row, deleted through the ORM so its groups and permissions go too
+            User.objects.filter(username=deleted_name(job.object_id), participant__isnull=True).delete()
+        jobs.update(status=DeletionJob.DONE, date_finished=timezone.now())
+    except Exception as e:
+        jobs.update(status=DeletionJob.FAILED, error=str(e), date_finished=timezone.now())
+    bump_dashboard_version()
+
+
+def process_pending(limit=None, batch_size=None, pause=None):
+    """Claim pending jobs and purge them one after another; returns the number of jobs handled."""
+    requeue_stale()
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        purge(job, batch_size, pause)
+    return len(jobs)
+
+
+def retry_failed():
+    """Queue failed jobs again, e.g. after a response written during the purge blocked the final DELETE."""
+    return DeletionJob.objects.filter(status=DeletionJob.FAILED).update(
+        status=DeletionJob.PENDING, claim='', rows_deleted=0, error='', date_finished=None
+    )
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .exports import response_rows, save_csv
+from .jobs import claim_pending, requeue, stale_jobs
+from .models import Experiment, ExportJob
+
+
+def enqueue_export(participant_id, experiment_id):
+    job, _ = ExportJob.objects.get_or_create(
+        participant_id=participant_id,
+        experiment_id=experiment_id,
+        status=ExportJob.PENDING
+    )
+    return job
+
+
+async def aenqueue_export(participant_id, experiment_id):
+    job, _ = await ExportJob.objects.aget_or_create(
+        participant_id=participant_id,
+        experiment_id=experiment_id,
+        status=ExportJob.PENDING
+    )
+    return job
+
+
+def requeue_stale():
+    """Queue running jobs again whose worker was killed before finishing them; returns the count."""
+    stale = stale_jobs(ExportJob, 'date_claimed', settings.MAAT_EXPORT_STALE_SECONDS)
+    # A pending job for the same participant and experiment already covers the
+    # export, and enqueue_export expects at most one
+    twins = ExportJob.objects.filter(
+        participant_id=OuterRef('participant_id'), experiment_id=OuterRef('experiment_id'), status=ExportJob.PENDING
+    )
+    stale.filter(Exists(twins)).update(
+        status=ExportJob.FAILED, error='Abandoned by its worker; a newer job covers it', date_finished=timezone.now()
+    )
+    return requeue(stale)
+
+
+def claim_jobs(limit=None):
+    """Mark pending jobs as running under a fresh claim token and return them."""
+    return claim_pending(ExportJob, 'date_claimed', limit)
+
+
+def export_experiment_batch(experiment_id, jobs):
+    """Write one CSV for all claimed participants of an experiment."""
+    claim = jobs[0].claim
+    # Once the jobs are requeued as stale, this worker's updates match nothing
+    claimed = ExportJob.objects.filter(id__in=[job.id for job in jobs], claim=claim)
+    try:
+        experiment = Experiment.objects.get(id=experiment_id)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        rows = response_rows(experiment_id, participant_ids=[job.participant_id for job in jobs])
+        filename = save_csv(f'experiment_results_{experiment.experiment_id}_{claim[:8]}_{timestamp}.csv', rows)
+
+        claimed.update(
+            status=ExportJob.DONE, file_name=filename, date_finished=timezone.now()
+        )
+    except Exception as e:
+        claimed.update(
+            status=ExportJob.FAILED, error=str(e), date_finished=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def process_pending(max_workers=4, limit=None):
+    """Claim pending jobs and export them in per-experiment batches; returns the number of jobs handled."""
+    requeue_stale()
+    jobs = claim_jobs(limit)
+    batches = {}
+    for job in jobs:
+        batches.setdefault(job.experiment_id, []).append(job)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for experiment_id, batch in batches.items():
+            pool.submit(export_experiment_batch, experiment_id, batch)
+    return len(jobs)
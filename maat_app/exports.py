@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+from datetime import datetime
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import storages
+from .archive import response_values
+
+EXPORT_HEADER = [
+    'Participant ID', 'Trial ID', 'Stimuli', 'Valence', 'Block Name',
+    'Response Time (ms)', 'Accuracy (1=Correct, 0=Incorrect)', 'Experiment ID'
+]
+
+EXPORT_COLUMNS = [
+    'participant__subject_id', 'trial_id', 'trial__stimuli', 'trial__valence', 'trial__block_name',
+    'response_time', 'accuracy', 'experiment__experiment_id'
+]
+
+EXPORT_CHUNK_SIZE = 2000
+# Result CSVs up to this size are built in memory before they are stored
+CSV_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+class Echo:
+    """File-like object whose write() hands the row back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def response_rows(experiment_id=None, participant_ids=None, live_only=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows as tuples, archived and live responses alike, in
+    response id order. Live rows come from a single joined query, fetched
+    chunk_size rows at a time so memory stays flat for large exports.
+    """
+    return response_values(EXPORT_COLUMNS, experiment_id, participant_ids, live_only=live_only, chunk_size=chunk_size)
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def save_csv(name, rows):
+    """Write the rows to the results storage under name (or a free variant of it) and return the stored name."""
+    with tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_SIZE) as spool:
+        text = io.TextIOWrapper(spool, encoding='utf-8', newline='')
+        text.writelines(csv_lines(rows))
+        text.flush()
+        spool.seek(0)
+        try:
+            return results_storage().save(name, File(spool, name))
+        finally:
+            text.detach()
+
+
+# Archive of the per-participant result files, kept in the 'results' storage
+# (settings.STORAGES), which several processes or hosts can share
+
+MANIFEST_FILENAME = '.manifest.json'
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def results_storage():
+    return storages['results']
+
+
+def file_timestamp(name, mtime):
+    # experiment_results_<subject>_<YYYYmmdd>_<HHMMSS>.csv, else fall back to mtime
+    try:
+        return datetime.strptime(name[-19:-4], '%Y%m%d_%H%M%S')
+    except ValueError:
+        return datetime.fromtimestamp(mtime)
+
+
+def scan_experiment_ids(storage, name):
+    with storage.open(name, 'rb') as stored, io.TextIOWrapper(stored, encoding='utf-8', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if not header or header[-1] != EXPORT_HEADER[-1]:
+            return []
+        return sorted({row[-1] for row in reader if row})
+
+
+def load_manifest(storage):
+    try:
+        with storage.open(MANIFEST_FILENAME, 'rb') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(storage, manifest):
+    storage.delete(MANIFEST_FILENAME)
+    saved = storage.save(MANIFEST_FILENAME, ContentFile(json.dumps(manifest).encode()))
+    if saved != MANIFEST_FILENAME:
+        # Another process rewrote the manifest meanwhile; its copy serves as well
+        storage.delete(saved)
+
+
+def refresh_manifest(storage):
+    """
+    Return {filename: entry} for every result CSV, where each entry holds
+    the file's size, mtime, timestamp and the experiment ids it contains.
+    Entries are cached in a manifest file and only files whose size or
+    mtime changed since the last call are re-read.
+    """
+    cached = load_manifest(storage)
+    try:
+        names = storage.listdir('')[1]
+    except FileNotFoundError:
+        # Nothing exported yet
+        names = []
+    manifest = {}
+    for name in names:
+        if not name.endswith('.csv'):
+            continue
+        size, mtime = storage.size(name), storage.get_modified_time(name).timestamp()
+        previous = cached.get(name)
+        if previous and previous['size'] == size and previous['mtime'] == mtime:
+            manifest[name] = previous
+            continue
+        manifest[name] = {
+            'size': size,
+            'mtime': mtime,
+            'timestamp': file_timestamp(name, mtime).isoformat(),
+            'experiments': scan_experiment_ids(storage, name),
+        }
+
+    if manifest != cached:
+        save_manifest(storage, manifest)
+    return manifest
+
+
+def select_result_files(manifest, experiment_id=None, start_date=None, end_date=None):
+    names = []
+    for name, entry in sorted(manifest.items()):
+        if experiment_id and experiment_id not in entry['experiments']:
+            continue
+        day = datetime.fromisoformat(entry['timestamp']).date()
+        if start_date and day < start_date:
+            continue
+        if end_date and day > end_date:
+            continue
+        names.append(name)
+    return names
+
+
+class ZipBuffer:
+    """Unseekable sink for ZipFile; archive bytes are drained as they are produced."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_stream(storage, manifest, names, chunk_size=ZIP_CHUNK_SIZE):
+    buffer = ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for name in names:
+            entry = manifest[name]
+            zinfo = zipfile.ZipInfo(name, datetime.fromtimestamp(entry['mtime']).timetuple()[:6])
+            zinfo.external_attr = 0o644 << 16
+            zinfo.file_size = entry['size']
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with storage.open(name, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+                while chunk := src.read(chunk_size):
+                    dst.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+    data = buffer.drain()
+    if data:
+        yield data
@@ -1,17 +1,58 @@
 from django import forms
 from .models import Experiment, Participant, Trial
+from .provisioning import check_subject_ids, expand_subject_ids
 
 class ExperimentForm(forms.ModelForm):
     class Meta:
         model = Experiment
-        fields = ['experiment_id', 'name', 'description', 'instructions', 'num_trials', 'text_size', 'text_increase_size', 'text_decrease_size']
+        fields = ['experiment_id', 'name', 'description', 'instructions', 'num_trials', 'text_size', 'text_increase_size', 'text_decrease_size', 'batched_run', 'counterbalance_blocks', 'schedule_seed']
 
 class RegisterParticipantForm(forms.ModelForm):
     class Meta:
         model = Participant
         fields = ['subject_id']
 
+class ProvisionParticipantsForm(forms.Form):
+    subject_ids = forms.CharField(
+        label='Participant IDs', widget=forms.Textarea,
+        help_text='One per line or comma separated; S{001..250} stands for S001 to S250.'
+    )
+    experiment = forms.ModelChoiceField(
+        queryset=Experiment.objects.all(), required=False,
+        help_text='Enroll every new participant in this experiment.'
+    )
+
+    def clean_subject_ids(self):
+        subject_ids = expand_subject_ids(self.cleaned_data['subject_ids'])
+        check_subject_ids(subject_ids)
+        return subject_ids
+
 class TrialForm(forms.ModelForm):
     class Meta:
         model = Trial
-        fields = ['experiment', 'block_order', 'block_name', 'stimuli', 'valence', 'random_fixation', 'movement']
\ No newline at end of file
+        fields = ['experiment', 'block_order', 'block_name', 'stimuli', 'valence', 'random_fixation', 'movement', 'asset']
+
+class TrialImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSONL with one trial object per line.')
+    experiment = forms.ModelChoiceField(
+        queryset=Experiment.objects.all(), required=False,
+        help_text="Leave empty to use each row's 'experiment' column."
+    )
+    replace = forms.BooleanField(required=False, help_text="Replace the experiment's existing trials.")
+    skip_invalid = forms.BooleanField(required=False, help_text='Import valid rows even if some rows are invalid.')
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(MultipleFileField, self).clean(item, initial) for item in data]
+        return [super().clean(data, initial)]
+
+class StimulusAssetForm(forms.Form):
+    files = MultipleFileField(help_text='Images (PNG, JPEG, GIF, WebP) or audio (MP3, WAV, OGG, M4A).')
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+from django.db import IntegrityError, transaction
+from .models import Trial, ResponseBatch, Response as ParticipantResponse
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def score_response(trial, response_key):
+    correct_response = 'Y' if trial.valence == 1 else 'N'
+    return 1 if response_key == correct_response else 0
+
+
+def parse_client_timestamp(value):
+    # Browsers send Date.now(), i.e. milliseconds since the epoch
+    if value is None:
+        return None
+    return datetime.fromtimestamp(float(value) / 1000, tz=timezone.utc)
+
+
+def ingest_responses(participant_id, batch_id, records, allowed_trial_ids, trials=None, expected_trial_ids=None):
+    """
+    Score and store a batch of response records in one transaction.
+    `trials` maps trial ids to objects with id, experiment_id and valence
+    (such as the cached trial set); without it they are fetched. Given
+    `expected_trial_ids`, a new batch must answer exactly those trials, in
+    that order.
+
+    Returns ``(num_saved, duplicate)``, where num_saved counts the rows
+    actually inserted; a batch id that was already received for the
+    participant (a client retry) saves nothing.
+    """
+    if not isinstance(batch_id, str) or not 0 < len(batch_id) <= 64:
+        raise InvalidBatch('Missing or invalid batch id')
+    try:
+        trial_ids = [record['trial_id'] for record in records]
+    except (KeyError, TypeError):
+        raise InvalidBatch('Malformed response batch')
+    if not set(trial_ids) <= set(allowed_trial_ids):
+        raise InvalidBatch('Unknown trial in response batch')
+
+    if trials is None:
+        trials = Trial.objects.only('id', 'experiment_id', 'valence').in_bulk(trial_ids)
+    responses = []
+    try:
+        for record in records:
+            trial = trials[record['trial_id']]
+            responses.append(ParticipantResponse(
+                participant_id=participant_id,
+                trial_id=trial.id,
+                experiment_id=trial.experiment_id,
+                response_time=float(record['response_time']),
+                accuracy=score_response(trial, record['response_key']),
+                client_timestamp=parse_client_timestamp(record.get('client_timestamp'))
+            ))
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        raise InvalidBatch('Malformed response batch')
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ResponseBatch.objects.create(
+                    participant_id=participant_id,
+                    batch_id=batch_id,
+                    num_responses=len(responses)
+                )
+        except IntegrityError:
+            return 0, True
+        if expected_trial_ids is not None and trial_ids != list(expected_trial_ids):
+            raise InvalidBatch('Responses do not follow the trial order')
+        # A trial the participant already answered keeps its first response;
+        # ignore_conflicts reports no count, so the rows are counted around it
+        answered = ParticipantResponse.objects.filter(participant_id=participant_id, trial_id__in=trial_ids)
+        before = answered.count()
+        ParticipantResponse.objects.bulk_create(responses, ignore_conflicts=True)
+        saved = answered.count() - before
+    return saved, False
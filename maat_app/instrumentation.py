@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from .models import RequestProfile
+
+# Upper bounds of the wall time histogram buckets; slower requests land in a final overflow bucket
+WALL_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+SUM_FIELDS = ('requests', 'errors', 'wall_ms', 'queries', 'query_ms', 'session_writes', 'session_bytes')
+MAX_FIELDS = ('wall_ms_max', 'queries_max', 'session_bytes_max')
+
+# [query count, query seconds] of the sampled request being served
+_request_queries = ContextVar('maat_request_queries', default=None)
+
+_buffer = deque(maxlen=settings.MAAT_INSTRUMENTATION_BUFFER_SIZE)
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+_period_start = timezone.now()
+
+
+def time_queries(execute, sql, params, many, context):
+    queries = _request_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries[0] += 1
+        queries[1] += time.perf_counter() - began
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # The wrapper list outlives reconnects of the same connection object
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def session_write_size(request):
+    session = getattr(request, 'session', None)
+    if session is None or not session.modified:
+        return None
+    return len(session.encode(dict(session.items())))
+
+
+def record(request, response, began, queries):
+    match = getattr(request, 'resolver_match', None)
+    _buffer.append((
+        match.view_name if match else 'unresolved',
+        (time.perf_counter() - began) * 1000,
+        queries[0],
+        queries[1] * 1000,
+        session_write_size(request),
+        response.status_code,
+    ))
+
+
+def flush_due():
+    return (len(_buffer) >= settings.MAAT_INSTRUMENTATION_FLUSH_SIZE
+            or time.monotonic() - _last_flush >= settings.MAAT_INSTRUMENTATION_FLUSH_SECONDS)
+
+
+def empty_stats():
+    stats = dict.fromkeys(SUM_FIELDS + MAX_FIELDS, 0)
+    stats['wall_histogram'] = [0] * (len(WALL_BUCKETS_MS) + 1)
+    return stats
+
+
+def aggregate(samples):
+    views = {}
+    for view, wall_ms, queries, query_ms, session_bytes, status in samples:
+        stats = views.setdefault(view, empty_stats())
+        stats['requests'] += 1
+        stats['errors'] += status >= 500
+        stats['wall_ms'] += wall_ms
+        stats['wall_ms_max'] = max(stats['wall_ms_max'], wall_ms)
+        stats['wall_histogram'][bisect_left(WALL_BUCKETS_MS, wall_ms)] += 1
+        stats['queries'] += queries
+        stats['queries_max'] = max(stats['queries_max'], queries)
+        stats['query_ms'] += query_ms
+        if session_bytes is not None:
+            stats['session_writes'] += 1
+            stats['session_bytes'] += session_bytes
+            stats['session_bytes_max'] = max(stats['session_bytes_max'], session_bytes)
+    return views
+
+
+def flush():
+    """
+    Store the buffered samples as one RequestProfile row per view and drop
+    rows past the retention period. Returns the number of samples stored.
+    """
+    global _last_flush, _period_start
+    if not _flush_lock.acquire(blocking=False):
+        # Another thread of this process is already flushing
+        return 0
+    try:
+        samples = [_buffer.popleft() for _ in range(len(_buffer))]
+        now = timezone.now()
+        period_start, _period_start, _last_flush = _period_start, now, time.monotonic()
+        if samples:
+            RequestProfile.objects.bulk_create([
+                RequestProfile(view=view, period_start=period_start, period_end=now,
+                               sample_rate=settings.MAAT_INSTRUMENTATION_SAMPLE_RATE, **stats)
+                for view, stats in aggregate(samples).items()
+            ])
+        RequestProfile.objects.filter(
+            period_end__lt=now - timedelta(days=settings.MAAT_INSTRUMENTATION_RETENTION_DAYS)
+        ).delete()
+        return len(samples)
+    finally:
+        _flush_lock.release()
+
+
+def percentile_bound(histogram, fraction, wall_ms_max):
+    """The upper bound of the histogram bucket holding the given fraction of requests."""
+    rank = fraction * sum(histogram)
+    seen = 0
+    for bound, count in zip(WALL_BUCKETS_MS, histogram):
+        seen += count
+        if seen >= rank:
+            return min(float(bound), wall_ms_max)
+    return wall_ms_max
+
+
+def instrumentation_report(since=None):
+    """Merge the stored profiles, optionally only those ending after `since`, into per-view statistics."""
+    profiles = RequestProfile.objects.order_by()
+    if since is not None:
+        profiles = profiles.filter(period_end__gte=since)
+    views = {}
+    for profile in profiles.iterator():
+        stats = views.setdefault(profile.view, {**empty_stats(), 'estimated_requests': 0.0})
+        for field in SUM_FIELDS:
+            stats[field] += getattr(profile, field)
+        for field in MAX_FIELDS:
+            stats[field] = max(stats[field], getattr(profile, field))
+        stats['wall_histogram'] = [a + b for a, b in zip(stats['wall_histogram'], profile.wall_histogram)]
+        stats['estimated_requests'] += profile.requests / profile.sample_rate
+
+    report = {}
+    for view, stats in sorted(views.items(), key=lambda item: -item[1]['wall_ms']):
+        n = stats['requests']
+        report[view] = {
+            'sampled_requests': n,
+            'estimated_requests': round(stats['estimated_requests']),
+            'errors': stats['errors'],
+            'mean_ms': round(stats['wall_ms'] / n, 2),
+            'p50_ms': percentile_bound(stats['wall_histogram'], 0.50, stats['wall_ms_max']),
+            'p95_ms': percentile_bound(stats['wall_histogram'], 0.95, stats['wall_ms_max']),
+            'p99_ms': percentile_bound(stats['wall_histogram'], 0.99, stats['wall_ms_max']),
+            'max_ms': round(stats['wall_ms_max'], 2),
+            'queries_mean': round(stats['queries'] / n, 2),
+            'queries_max': stats['queries_max'],
+            'query_ms_mean': round(stats['query_ms'] / n, 2),
+            'query_share': round(stats['query_ms'] / stats['wall_ms'], 3) if stats['wall_ms'] else None,
+            'session_writes': stats['session_writes'],
+            'session_bytes_mean': round(stats['session_bytes'] / stats['session_writes']) if stats['session_writes'] else None,
+            'session_bytes_max': stats['session_bytes_max'],
+            'histogram': dict(zip([f'<={bound}ms' for bound in WALL_BUCKETS_MS] + [f'>{WALL_BUCKETS_MS[-1]}ms'],
+                                  stats['wall_histogram'])),
+        }
+    return report
+
+
+class InstrumentationMiddleware:
+    """
+    Records wall time, query count and time, and session write size for a
+    random MAAT_INSTRUMENTATION_SAMPLE_RATE share of requests. Unsampled
+    requests cost one random() call. Place it first so the timing covers
+    the other middleware, including the session save.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.MAAT_INSTRUMENTATION_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_timer, dispatch_uid='maat_instrumentation')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(None, connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.MAAT_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        began = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        record(request, response, began, queries)
+        if flush_due():
+            flush()
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.MAAT_INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        began = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        record(request, response, began, queries)
+        if flush_due():
+            await sync_to_async(flush)()
+        return response
@@ -0,0 +1,37 @@
+import uuid
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+
+# Claiming shared by the export and deletion queues. Their job models both
+# have status (with PENDING and RUNNING), claim and a claim-time field, the
+# latter refreshed by workers that send heartbeats.
+
+
+def claim_pending(model, claimed_at, limit=None):
+    """
+    Mark pending jobs as running under a fresh claim token and return them,
+    oldest first. The conditional UPDATE makes claiming safe with several
+    workers running.
+    """
+    pending_ids = model.objects.filter(status=model.PENDING).order_by('id').values_list('id', flat=True)
+    if limit:
+        pending_ids = pending_ids[:limit]
+    claim = uuid.uuid4().hex
+    model.objects.filter(id__in=list(pending_ids), status=model.PENDING).update(
+        status=model.RUNNING, claim=claim, **{claimed_at: timezone.now()}
+    )
+    return list(model.objects.filter(claim=claim, status=model.RUNNING).order_by('id'))
+
+
+def stale_jobs(model, claimed_at, stale_seconds):
+    """Running jobs whose claim time is older than stale_seconds, i.e. whose worker was killed."""
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    # Jobs claimed before claim times were recorded have none
+    stale = Q(**{f'{claimed_at}__lt': cutoff}) | Q(**{f'{claimed_at}__isnull': True})
+    return model.objects.filter(stale, status=model.RUNNING)
+
+
+def requeue(jobs, **reset):
+    """Queue jobs again for any worker to claim; returns the count."""
+    return jobs.update(status=jobs.model.PENDING, claim='', **reset)
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import math
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Q
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from .models import Experiment, Participant, Trial
+
+PAYLOAD_PATTERN = re.compile(r'<script id="trial-payload" type="application/json">(.*?)</script>', re.S)
+
+_query_counter = ContextVar('loadtest_query_counter', default=None)
+
+
+def create_fixture(participants, trials, blocks=1, batched=False, counterbalance=False, experiments=1):
+    """
+    A throwaway experiment and participants, all tagged loadtest-<hex> for
+    cleanup. Returns the tag, the experiment and (participant id, subject id)
+    pairs. Further experiments, with the same trials, get the ids <tag>-1 ...
+    """
+    tag = f'loadtest-{uuid.uuid4().hex[:8]}'
+    Experiment.objects.bulk_create([
+        Experiment(
+            experiment_id=tag if n == 0 else f'{tag}-{n}', name=tag,
+            instructions='Press Y for positive words and N for negative words.',
+            batched_run=batched, counterbalance_blocks=counterbalance
+        )
+        for n in range(experiments)
+    ])
+    created = list(fixture_experiments(tag).order_by('id'))
+    Trial.objects.bulk_create([
+        Trial(experiment=experiment, block_order=i % blocks + 1, block_name=f'block{i % blocks + 1}',
+              stimuli=f'word{i}', valence=i % 2, random_fixation=0, movement=i % 2)
+        for experiment in created for i in range(trials)
+    ], batch_size=5000)
+    User.objects.bulk_create([User(username=f'{tag}-{i}') for i in range(participants)], batch_size=5000)
+    users = User.objects.filter(username__startswith=f'{tag}-')
+    Participant.objects.bulk_create([Participant(user=user, subject_id=user.username) for user in users], batch_size=5000)
+    pairs = list(Participant.objects.filter(subject_id__startswith=f'{tag}-').values_list('id', 'subject_id'))
+    return tag, created[0], pairs
+
+
+def fixture_experiments(tag):
+    return Experiment.objects.filter(Q(experiment_id=tag) | Q(experiment_id__startswith=f'{tag}-'))
+
+
+def remove_fixture(tag):
+    fixture_experiments(tag).delete()
+    User.objects.filter(username__startswith=f'{tag}-').delete()
+
+
+def allow_test_clients():
+    # The test clients send Host: testserver
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+
+def session_script(experiment, participant_id, subject_id, trials):
+    """
+    One participant's requests in browser order as (view, method, path, data)
+    steps; each (status, body) response is sent back in. Redirects are
+    requested explicitly, so every request is timed under the view serving it.
+    """
+    login = reverse('participant_login')
+    instructions = reverse('show_instructions', args=[participant_id, experiment.id])
+    yield 'participant_login', 'get', login, None
+    yield 'participant_login', 'post', login, {'participant_id': subject_id, 'experiment_id': experiment.experiment_id}
+    yield 'show_instructions', 'get', instructions, None
+    yield 'show_instructions', 'post', instructions, {}
+    status, body = yield 'start_experiment', 'get', reverse('start_experiment', args=[participant_id, experiment.id]), None
+
+    if experiment.batched_run:
+        payload = json.loads(PAYLOAD_PATTERN.search(body).group(1))
+        run_token = uuid.uuid4().hex[:12]
+        batch_size = payload['batch_size']
+        for sequence, first in enumerate(range(0, len(payload['trials']), batch_size)):
+            responses = [
+                {'trial_id': trial['id'], 'response_key': 'Y', 'response_time': 500.0,
+                 'client_timestamp': int(time.time() * 1000)}
+                for trial in payload['trials'][first:first + batch_size]
+            ]
+            yield 'save_responses', 'json', reverse('save_responses'), {
+                'batch_id': f'{run_token}-{sequence}', 'responses': responses
+            }
+    else:
+        # One more run_trial than there are trials: the last one redirects to completion
+        for _ in range(trials + 1):
+            status, body = yield 'run_trial', 'get', reverse('run_trial'), None
+            if status != 200:
+                break
+            yield 'save_response', 'post', reverse('save_response'), {'response_time': '500.0', 'response_key': 'Y'}
+    yield 'experiment_complete', 'get', reverse('experiment_complete'), None
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@contextmanager
+def counting_queries():
+    """
+    Count the queries of connections opened meanwhile against the request
+    being timed; the counter follows the request into the threads
+    sync_to_async runs it on.
+    """
+    connection_created.connect(install_query_counter)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install_query_counter)
+
+
+def timed(view, status, began, counter):
+    return view, time.perf_counter() - began, counter[0], status
+
+
+def drive(script, send):
+    """Run a session script through send(method, path, data) -> (status, body); returns its samples."""
+    samples = []
+    step = next(script)
+    while True:
+        view, method, path, data = step
+        counter = [0]
+        token = _query_counter.set(counter)
+        began = time.perf_counter()
+        try:
+            status, body = send(method, path, data)
+        finally:
+            _query_counter.reset(token)
+        samples.append(timed(view, status, began, counter))
+        try:
+            step = script.send((status, body))
+        except StopIteration:
+            return samples
+
+
+async def adrive(script, send):
+    samples = []
+    step = next(script)
+    while True:
+        view, method, path, data = step
+        counter = [0]
+        token = _query_counter.set(counter)
+        began = time.perf_counter()
+        try:
+            # One context per request, as the ASGI handler does, so sync ORM work
+            # of concurrent requests is not funnelled through a single thread
+            async with ThreadSensitiveContext():
+                status, body = await send(method, path, data)
+        finally:
+            _query_counter.reset(token)
+        samples.append(timed(view, status, began, counter))
+        try:
+            step = script.send((status, body))
+        except StopIteration:
+            return samples
+
+
+def client_sender(client):
+    def send(method, path, data):
+        if method == 'json':
+            response = client.post(path, json.dumps(data), content_type='application/json')
+        elif method == 'post':
+            response = client.post(path, data)
+        else:
+            response = client.get(path)
+        return response.status_code, response.content.decode()
+    return send
+
+
+def async_client_sender(client):
+    async def send(method, path, data):
+        if method == 'json':
+            response = await client.post(path, json.dumps(data), content_type='application/json')
+        elif method == 'post':
+            response = await client.post(path, data)
+        else:
+            response = await client.get(path)
+        return response.status_code, response.content.decode()
+    return send
+
+
+class NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def live_sender(base_url):
+    """Send over HTTP to a running server, keeping cookies and the CSRF token like a browser."""
+    cookies = CookieJar()
+    opener = build_opener(HTTPCookieProcessor(cookies), NoRedirect)
+
+    def send(method, path, data):
+        csrf_token = next((cookie.value for cookie in cookies if cookie.name == settings.CSRF_COOKIE_NAME), '')
+        headers = {'X-CSRFToken': csrf_token, 'Referer': base_url}
+        body = None
+        if method == 'json':
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        elif method == 'post':
+            body = urlencode(data).encode()
+        try:
+            with opener.open(Request(urljoin(base_url, path), data=body, headers=headers)) as response:
+                return response.status, response.read().decode()
+        except HTTPError as e:
+            return e.code, e.read().decode()
+    return send
+
+
+def run_sessions(scripts, concurrency, make_sender=lambda: client_sender(Client())):
+    """Drive the scripts on `concurrency` threads, like a threaded WSGI server; returns (seconds, samples)."""
+    def run(script):
+        try:
+            return drive(script, make_sender())
+        finally:
+            connections.close_all()
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run, scripts))
+    return time.perf_counter() - began, [sample for samples in results for sample in samples]
+
+
+def run_async_sessions(scripts, concurrency):
+    """Drive the scripts through the ASGI handler on one event loop, at most `concurrency` at a time."""
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run(script):
+            async with slots:
+                return await adrive(script, async_client_sender(AsyncClient()))
+
+        return await asyncio.gather(*(run(script) for script in scripts))
+
+    began = time.perf_counter()
+    results = asyncio.run(run_all())
+    return time.perf_counter() - began, [sample for samples in results for sample in samples]
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank, so every reported value is an observed one
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_stats(samples, with_queries=True):
+    latencies = sorted(seconds for _, seconds, _, _ in samples)
+    stats = {
+        'requests': len(samples),
+        'errors': sum(1 for *_, status in samples if status >= 400),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+    if with_queries:
+        queries = [count for _, _, count, _ in samples]
+        stats['queries_mean'] = round(sum(queries) / len(queries), 2)
+        stats['queries_max'] = max(queries)
+    return stats
+
+
+def summarize(elapsed, samples, sessions, with_queries=True):
+    """Throughput plus overall and per-view latency (and query count) statistics."""
+    if not samples:
+        return {'seconds': round(elapsed, 3), 'requests': 0}
+    views = {}
+    for sample in samples:
+        views.setdefault(sample[0], []).append(sample)
+    return {
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'sessions_per_second': round(sessions / elapsed, 2),
+        **latency_stats(samples, with_queries),
+        'views': {view: latency_stats(view_samples, with_queries) for view, view_samples in views.items()},
+    }
+
+
+def find_regressions(report, baseline, tolerance):
+    """
+    Compare a report with an earlier one: failed requests, a per-view p95
+    more than `tolerance` (a fraction) slower, or more queries per request.
+    """
+    regressions = []
+    if report.get('errors'):
+        regressions.append(f"{report['errors']} request(s) failed")
+    for view, stats in report.get('views', {}).items():
+        before = baseline.get('views', {}).get(view)
+        if before is None:
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{view}: p95 {before['p95_ms']} -> {stats['p95_ms']} ms")
+        if 'queries_max' in stats and 'queries_max' in before and stats['queries_max'] > before['queries_max']:
+            regressions.append(f"{view}: queries per request {before['queries_max']} -> {stats['queries_max']}")
+    return regressions
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from maat_app.archive import ARCHIVE_CHUNK_SIZE, archive_completed
+from maat_app.dashboard import bump_dashboard_version
+from maat_app.models import Experiment
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed experiments' responses out of the Response table into compressed column-wise "
+        'archive parts. Exports and analytics read both.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--experiment', action='append', help='Experiment ID to archive (repeatable; default: all completed).')
+        parser.add_argument('--complete', action='store_true', help='Mark the given experiments complete first.')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help='Responses per archive part.')
+
+    def handle(self, *args, **options):
+        experiment_ids = None
+        if options['experiment']:
+            experiments = dict(Experiment.objects.filter(experiment_id__in=options['experiment']).values_list(
+                'experiment_id', 'id'
+            ))
+            unknown = set(options['experiment']) - set(experiments)
+            if unknown:
+                raise CommandError(f"Unknown experiment(s): {', '.join(sorted(unknown))}")
+            experiment_ids = list(experiments.values())
+            if options['complete']:
+                Experiment.objects.filter(id__in=experiment_ids, completed_at__isnull=True).update(completed_at=timezone.now())
+        elif options['complete']:
+            raise CommandError('--complete needs --experiment')
+
+        moved = archive_completed(experiment_ids, chunk_size=options['chunk_size'])
+        for experiment, count in moved.items():
+            self.stdout.write(f'{experiment.experiment_id}: archived {count} response(s)')
+        if moved:
+            bump_dashboard_version()
+        else:
+            self.stdout.write('Nothing to archive.')
@@ -0,0 +1,97 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from maat_app.exports import EXPORT_COLUMNS
+from maat_app.loadtest import create_fixture, fixture_experiments, remove_fixture
+from maat_app.models import Response as ParticipantResponse, Trial
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the response/trial hot-path queries on a synthetic loadtest-* dataset and print their query plans, '
+        'first with the Response and Trial Meta.indexes dropped, then with them in place, comparing also the Trial '
+        'join with the denormalized Response.experiment column. The unique (participant, trial) constraint stays, '
+        'as it guards the writes of sessions in progress.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=200)
+        parser.add_argument('--trials', type=int, default=200, help='Trials per experiment, all answered by everyone.')
+        parser.add_argument('--experiments', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; the median is reported.')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows.')
+
+    def time_queries(self, queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - began)
+            results[name] = {
+                'median_ms': round(statistics.median(timings) * 1000, 3),
+                'plan': queryset.explain().splitlines(),
+            }
+        return results
+
+    def handle(self, *args, **options):
+        tag, _, pairs = create_fixture(options['participants'], options['trials'], blocks=4, experiments=options['experiments'])
+        # The fixture lives in the configured database, so it goes even when a run fails
+        try:
+            self.stdout.write(json.dumps(self.benchmark(tag, pairs, options), indent=2))
+        finally:
+            if not options['keep']:
+                remove_fixture(tag)
+
+    def benchmark(self, tag, pairs, options):
+        experiments = list(fixture_experiments(tag).order_by('id'))
+        participants = [participant_id for participant_id, _ in pairs]
+        trials = list(Trial.objects.filter(experiment__in=experiments).values_list('id', 'experiment_id'))
+        for participant_id in participants:
+            ParticipantResponse.objects.bulk_create([
+                ParticipantResponse(participant_id=participant_id, trial_id=trial_id, experiment_id=experiment_id,
+                                    response_time=500.0, accuracy=1)
+                for trial_id, experiment_id in trials
+            ], batch_size=5000)
+
+        experiment = experiments[0]
+        participant_id = participants[len(participants) // 2]
+        trial_id = trials[0][0]
+        queries = {
+            'experiment_export_via_trial_join': ParticipantResponse.objects.filter(
+                trial__experiment=experiment).values_list(*EXPORT_COLUMNS),
+            'experiment_export_denormalized': ParticipantResponse.objects.filter(
+                experiment=experiment).values_list(*EXPORT_COLUMNS),
+            'participant_export': ParticipantResponse.objects.filter(
+                participant_id=participant_id).values_list(*EXPORT_COLUMNS),
+            'experiment_response_ids_via_trial_join': ParticipantResponse.objects.filter(
+                trial__experiment=experiment).values('id'),
+            'experiment_response_ids_denormalized': ParticipantResponse.objects.filter(experiment=experiment).values('id'),
+            'duplicate_submission_check': ParticipantResponse.objects.filter(
+                participant_id=participant_id, trial_id=trial_id).values('id'),
+            'session_start_trials': Trial.objects.filter(experiment=experiment).order_by('block_order').values_list('id'),
+        }
+
+        indexes = [(model, index) for model in (ParticipantResponse, Trial) for index in model._meta.indexes]
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        try:
+            without_indexes = self.time_queries(queries, options['repeat'])
+        finally:
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+        with_indexes = self.time_queries(queries, options['repeat'])
+
+        return {
+            'responses': ParticipantResponse.objects.filter(experiment__in=experiments).count(),
+            'indexes': [index.name for _, index in indexes],
+            'queries': {
+                name: {'without_indexes': without_indexes[name], 'with_indexes': with_indexes[name]}
+                for name in queries
+            },
+        }
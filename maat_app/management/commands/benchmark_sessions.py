@@ -0,0 +1,100 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from maat_app.loadtest import (
+    allow_test_clients, counting_queries, create_fixture, find_regressions, live_sender, remove_fixture,
+    run_async_sessions, run_sessions, session_script, summarize
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate complete participant sessions (login, instructions, start, every trial, completion) against a '
+        'temporary loadtest-* experiment and report throughput plus p50/p95/p99 latency and queries per request for '
+        'each view as JSON. Runs in-process through the test client (--mode wsgi or asgi) or over HTTP against a '
+        'local server sharing this database (--url). A comma-separated --participants list runs a sweep, one fresh '
+        'fixture per count. With --baseline, exits non-zero on a regression.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='asgi' if settings.MAAT_ASYNC_VIEWS else 'wsgi')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000/.')
+        parser.add_argument('--participants', default='50',
+                            help='Simulated participants, one session each, or a comma-separated list such as 10,50,100.')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Sessions in flight at once; 0 starts every session at once.')
+        parser.add_argument('--trials', type=int, default=40, help='Trials in the fixture experiment.')
+        parser.add_argument('--blocks', type=int, default=1, help='Blocks the trials are spread over.')
+        parser.add_argument('--batched', action='store_true', help='Use a batched-run experiment.')
+        parser.add_argument('--counterbalance', action='store_true', help='Counterbalance the blocks.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--baseline', help='An earlier JSON report to check this run against.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown per view against the baseline, as a fraction.')
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(value) for value in options['participants'].split(',')]
+        except ValueError:
+            raise CommandError('--participants must be a number or a comma-separated list of numbers.')
+        if min(counts) < 1 or options['concurrency'] < 0 or options['trials'] < 1:
+            raise CommandError('--participants and --trials must be positive and --concurrency not negative.')
+        baseline = None
+        if options['baseline']:
+            if len(counts) > 1:
+                raise CommandError('--baseline compares a single --participants count.')
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        report = {
+            'target': options['url'] or options['mode'],
+            'async_views': settings.MAAT_ASYNC_VIEWS,
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'trials': options['trials'],
+            'blocks': options['blocks'],
+            'batched': options['batched'],
+            'counterbalance': options['counterbalance'],
+        }
+        runs = [self.run(count, options) for count in counts]
+        if len(runs) == 1:
+            report.update(runs[0])
+        else:
+            report['runs'] = runs
+        if baseline is not None:
+            report['regressions'] = find_regressions(report, baseline, options['tolerance'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if report.get('regressions'):
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(report['regressions']))
+
+    def run(self, count, options):
+        concurrency = options['concurrency'] or count
+        tag, experiment, participants = create_fixture(
+            count, options['trials'], max(options['blocks'], 1), options['batched'], options['counterbalance']
+        )
+        try:
+            scripts = [
+                session_script(experiment, participant_id, subject_id, options['trials'])
+                for participant_id, subject_id in participants
+            ]
+            if options['url']:
+                elapsed, samples = run_sessions(scripts, concurrency, lambda: live_sender(options['url']))
+            else:
+                with allow_test_clients(), counting_queries():
+                    if options['mode'] == 'wsgi':
+                        elapsed, samples = run_sessions(scripts, concurrency)
+                    else:
+                        elapsed, samples = run_async_sessions(scripts, concurrency)
+        finally:
+            remove_fixture(tag)
+        return {
+            'participants': count,
+            'concurrency': concurrency,
+            # Queries can only be counted in-process
+            **summarize(elapsed, samples, count, with_queries=not options['url']),
+        }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from maat_app.models import Experiment
+from maat_app.schedules import build_schedules
+
+
+class Command(BaseCommand):
+    help = 'Precompute the seeded trial schedules of one or all experiments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--experiment', help='Experiment ID to build (default: all experiments).')
+
+    def handle(self, *args, **options):
+        experiments = Experiment.objects.all()
+        if options['experiment']:
+            experiments = experiments.filter(experiment_id=options['experiment'])
+            if not experiments.exists():
+                raise CommandError(f"Unknown experiment '{options['experiment']}'")
+
+        for experiment in experiments:
+            count = build_schedules(experiment)
+            self.stdout.write(f'{experiment.experiment_id}: {count} schedule(s) from seed {experiment.schedule_seed}')
@@ -0,0 +1,33 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from maat_app.columnar import COLUMNAR_CHUNK_SIZE, export_columnar
+from maat_app.exports import results_storage
+from maat_app.models import Experiment
+
+
+class Command(BaseCommand):
+    help = 'Append new responses to a typed columnar (.npz) export; only rows after the last exported id, and late commits just below it, are read.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--experiment', help='Experiment ID to export (default: all experiments).')
+        parser.add_argument('--output', help='Output directory (default: experiment_results/columnar/<experiment>).')
+        parser.add_argument('--chunk-size', type=int, default=COLUMNAR_CHUNK_SIZE, help='Rows per part file.')
+        parser.add_argument('--full', action='store_true', help='Discard existing parts and export everything again.')
+
+    def handle(self, *args, **options):
+        experiment_id = None
+        if options['experiment']:
+            try:
+                experiment = Experiment.objects.get(experiment_id=options['experiment'])
+            except Experiment.DoesNotExist:
+                raise CommandError(f"Unknown experiment '{options['experiment']}'")
+            experiment_id = experiment.pk
+
+        output_dir = options['output']
+        if not output_dir:
+            try:
+                output_dir = results_storage().path(os.path.join('columnar', options['experiment'] or 'all'))
+            except NotImplementedError:
+                raise CommandError('Results are not stored on a local file system; give an --output directory')
+        written = export_columnar(output_dir, experiment_id, chunk_size=options['chunk_size'], full=options['full'])
+        self.stdout.write(f'Wrote {written} row(s) to {output_dir}')
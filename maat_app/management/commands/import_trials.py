@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from maat_app.models import Experiment
+from maat_app.trial_import import IMPORT_CHUNK_SIZE, detect_format, import_trials
+
+
+class Command(BaseCommand):
+    help = 'Bulk import trials from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or JSONL file of trials.')
+        parser.add_argument('--experiment', help="Experiment ID for every row (default: each row's 'experiment' column).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension).')
+        parser.add_argument('--replace', action='store_true', help="Replace the target experiments' existing trials.")
+        parser.add_argument('--skip-invalid', action='store_true', help='Import valid rows even if some rows are invalid.')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows per bulk insert.')
+
+    def handle(self, *args, **options):
+        experiment = None
+        if options['experiment']:
+            try:
+                experiment = Experiment.objects.get(experiment_id=options['experiment'])
+            except Experiment.DoesNotExist:
+                raise CommandError(f"Unknown experiment '{options['experiment']}'")
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_trials(
+                stream,
+                fmt=options['format'] or detect_format(options['path']),
+                experiment=experiment,
+                replace=options['replace'],
+                skip_invalid=options['skip_invalid'],
+                chunk_size=options['chunk_size']
+            )
+
+        for line, message in report.errors:
+            self.stderr.write(f'line {line}: {message}')
+        self.stdout.write(f'Created {report.created} trial(s), replaced {report.replaced}.')
+        if report.errors and not options['skip_invalid']:
+            raise CommandError(f'{len(report.errors)} invalid row(s); nothing was imported.')
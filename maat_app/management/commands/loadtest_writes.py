@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+from maat_app.ingest import ingest_responses
+from maat_app.loadtest import create_fixture, remove_fixture
+from maat_app.models import Response as ParticipantResponse, Trial
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure response write throughput against the configured database with concurrent simulated '
+        'participants. Creates temporary loadtest-* rows and removes them afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=50, help='Concurrent participants (threads).')
+        parser.add_argument('--trials', type=int, default=100, help='Responses written per participant.')
+        parser.add_argument('--batch-size', type=int, default=1,
+                            help='Responses per write; 1 mimics save_response, more mimics batched runs.')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows.')
+
+    def handle(self, *args, **options):
+        tag, experiment, pairs = create_fixture(options['participants'], options['trials'])
+        # The fixture lives in the configured database, so it goes even when a run fails
+        try:
+            self.stdout.write(json.dumps(self.measure(tag, experiment, pairs, options), indent=2))
+        finally:
+            if not options['keep']:
+                remove_fixture(tag)
+
+    def measure(self, tag, experiment, pairs, options):
+        trial_ids = list(Trial.objects.filter(experiment=experiment).values_list('id', flat=True))
+        participant_ids = [participant_id for participant_id, _ in pairs]
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(len(participant_ids))
+
+        def simulate(participant_id):
+            batch_size = options['batch_size']
+            own_latencies = []
+            own_errors = 0
+            start_barrier.wait()
+            for offset in range(0, len(trial_ids), batch_size):
+                records = [
+                    {'trial_id': trial_id, 'response_key': 'Y', 'response_time': 500.0}
+                    for trial_id in trial_ids[offset:offset + batch_size]
+                ]
+                began = time.perf_counter()
+                try:
+                    if batch_size == 1:
+                        with transaction.atomic():
+                            ParticipantResponse.objects.create(
+                                participant_id=participant_id, trial_id=records[0]['trial_id'],
+                                experiment=experiment, response_time=500.0, accuracy=1
+                            )
+                    else:
+                        ingest_responses(participant_id, f'{tag}-{offset}', records, trial_ids)
+                except OperationalError:
+                    own_errors += 1
+                own_latencies.append(time.perf_counter() - began)
+            connections.close_all()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        threads = [threading.Thread(target=simulate, args=(participant_id,)) for participant_id in participant_ids]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        written = ParticipantResponse.objects.filter(experiment=experiment).count()
+        latencies.sort()
+        return {
+            'vendor': connection.vendor,
+            'participants': len(participant_ids),
+            'responses_per_participant': options['trials'],
+            'batch_size': options['batch_size'],
+            'seconds': round(elapsed, 3),
+            'responses_written': written,
+            'responses_per_second': round(written / elapsed, 1) if elapsed else None,
+            'write_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            'write_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+            'locked_errors': sum(errors),
+        }
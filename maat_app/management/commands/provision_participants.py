@@ -0,0 +1,45 @@
+import sys
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from maat_app.models import Experiment
+from maat_app.provisioning import credential_lines, credential_rows, expand_subject_ids, provision_participants
+
+
+class Command(BaseCommand):
+    help = (
+        'Register participants in bulk, e.g. "S{001..250}", and write their login details as CSV. '
+        'Users get unusable passwords; participants log in with their participant and experiment ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('subject_ids', nargs='*', help='Participant ids or range patterns such as S{001..250}.')
+        parser.add_argument('--file', help='Read participant ids from this file (whitespace or comma separated).')
+        parser.add_argument('--experiment', help='Experiment ID to enroll the new participants in.')
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Site address used in the login URLs.')
+        parser.add_argument('--output', help='Write the CSV here instead of to stdout.')
+
+    def handle(self, *args, **options):
+        experiment = None
+        if options['experiment']:
+            try:
+                experiment = Experiment.objects.get(experiment_id=options['experiment'])
+            except Experiment.DoesNotExist:
+                raise CommandError(f"Unknown experiment '{options['experiment']}'")
+
+        text = ' '.join(options['subject_ids'])
+        if options['file']:
+            with open(options['file'], encoding='utf-8-sig') as stream:
+                text = f'{text} {stream.read()}'
+        try:
+            subject_ids = provision_participants(expand_subject_ids(text), experiment)
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        rows = credential_rows(subject_ids, experiment, f"{options['base_url'].rstrip('/')}{reverse('participant_login')}")
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(credential_lines(rows))
+        else:
+            sys.stdout.writelines(credential_lines(rows))
+        self.stderr.write(f'Registered {len(subject_ids)} participant(s).')
@@ -0,0 +1,39 @@
+import json
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from maat_app.instrumentation import WALL_BUCKETS_MS, instrumentation_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Print per-view request timings, query counts and session write sizes sampled by the instrumentation '
+        'middleware across all server processes, slowest total first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Only profiles from the last N hours.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON, histograms included.')
+
+    def handle(self, *args, **options):
+        report = instrumentation_report(timezone.now() - timedelta(hours=options['hours']))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if not report:
+            self.stdout.write('No requests sampled yet.')
+            return
+
+        width = max(len(view) for view in report)
+        self.stdout.write(
+            f"{'view':<{width}} {'sampled':>8} {'mean':>8} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>8} "
+            f"{'queries':>7} {'query ms':>8} {'session B':>9}"
+        )
+        for view, stats in report.items():
+            self.stdout.write(
+                f"{view:<{width}} {stats['sampled_requests']:>8} {stats['mean_ms']:>8.1f} {stats['p50_ms']:>6.0f} "
+                f"{stats['p95_ms']:>6.0f} {stats['p99_ms']:>6.0f} {stats['max_ms']:>8.1f} "
+                f"{stats['queries_mean']:>7.1f} {stats['query_ms_mean']:>8.1f} "
+                f"{stats['session_bytes_mean'] if stats['session_bytes_mean'] is not None else '-':>9}"
+            )
+        self.stdout.write(f'Wall time buckets (ms): {", ".join(map(str, WALL_BUCKETS_MS))}; use --json for histograms.')
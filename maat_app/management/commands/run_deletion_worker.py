@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from maat_app.deletion import process_pending, retry_failed
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted experiments and participants, with their related rows, in small DELETE batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per DELETE statement.')
+        parser.add_argument('--pause', type=float, default=None, help='Seconds to sleep between batches.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed deletions again before starting.')
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit.')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f'Queued {retry_failed()} failed deletion(s) again')
+        while True:
+            handled = process_pending(batch_size=options['batch_size'], pause=options['pause'])
+            if handled:
+                self.stdout.write(f'Processed {handled} deletion(s)')
+            if options['once']:
+                break
+            if not handled:
+                time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from maat_app.export_queue import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Materialize queued experiment result exports into per-experiment CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of export threads.')
+        parser.add_argument('--limit', type=int, default=None, help='Maximum jobs to claim per pass.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending(max_workers=options['workers'], limit=options['limit'])
+            if handled:
+                self.stdout.write(f'Exported {handled} job(s)')
+            if options['once']:
+                break
+            if not handled:
+                time.sleep(options['interval'])
@@ -0,0 +1,117 @@
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+from .models import Experiment, Participant, Trial
+
+# Read-through cache of the static data the participant hot path needs:
+# experiments, participants and each experiment's trial set. Entries are
+# dropped by the signal handlers in signals.py (and by schedules.py, which
+# updates experiments without signals). With the per-process backend, other
+# processes see a change once the cache TIMEOUT expires; a shared backend
+# (settings.MAAT_CACHE_BACKEND) drops it everywhere at once.
+
+TRIAL_INFO_COLUMNS = [
+    'id', 'experiment_id', 'block_order', 'block_name', 'stimuli', 'valence', 'random_fixation', 'movement',
+    'asset__sha256', 'asset__extension', 'asset__content_type',
+]
+TrialInfo = namedtuple('TrialInfo', [column.replace('__', '_') for column in TRIAL_INFO_COLUMNS])
+
+
+def metadata_cache():
+    return caches[settings.MAAT_METADATA_CACHE]
+
+
+def experiment_key(experiment_pk):
+    return f'maat:experiment:{int(experiment_pk)}'
+
+
+def participant_key(participant_pk):
+    return f'maat:participant:{int(participant_pk)}'
+
+
+def trials_key(experiment_pk):
+    return f'maat:trials:{int(experiment_pk)}'
+
+
+def read_through(key, load):
+    cache = metadata_cache()
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+async def aread_through(key, load):
+    cache = metadata_cache()
+    value = await cache.aget(key)
+    if value is None:
+        value = await load()
+        if value is not None:
+            await cache.aset(key, value)
+    return value
+
+
+def get_experiment(experiment_pk):
+    return read_through(experiment_key(experiment_pk), lambda: Experiment.objects.filter(pk=experiment_pk).first())
+
+
+def get_participant(participant_pk):
+    return read_through(participant_key(participant_pk), lambda: Participant.objects.filter(pk=participant_pk).first())
+
+
+def experiment_trials(experiment_pk):
+    """The experiment's trials as {trial id: TrialInfo}."""
+    return read_through(trials_key(experiment_pk), lambda: {
+        row[0]: TrialInfo._make(row)
+        for row in Trial.objects.filter(experiment_id=experiment_pk).values_list(*TRIAL_INFO_COLUMNS)
+    })
+
+
+async def aexperiment_trials(experiment_pk):
+    async def load():
+        return {
+            row[0]: TrialInfo._make(row)
+            async for row in Trial.objects.filter(experiment_id=experiment_pk).values_list(*TRIAL_INFO_COLUMNS)
+        }
+    return await aread_through(trials_key(experiment_pk), load)
+
+
+def get_or_404(get, pk):
+    try:
+        instance = get(pk)
+    except ValueError:
+        # Primary keys arrive as URL strings
+        instance = None
+    if instance is None:
+        raise Http404
+    return instance
+
+
+def experiment_or_404(experiment_pk):
+    return get_or_404(get_experiment, experiment_pk)
+
+
+def participant_or_404(participant_pk):
+    return get_or_404(get_participant, participant_pk)
+
+
+def trial_or_404(trials, trial_id):
+    trial = trials.get(trial_id)
+    if trial is None:
+        raise Http404
+    return trial
+
+
+def forget_experiment(experiment_pk):
+    metadata_cache().delete(experiment_key(experiment_pk))
+
+
+def forget_participant(participant_pk):
+    metadata_cache().delete(participant_key(participant_pk))
+
+
+def forget_trials(experiment_pk):
+    metadata_cache().delete(trials_key(experiment_pk))
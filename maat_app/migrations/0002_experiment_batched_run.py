@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='batched_run',
+            field=models.BooleanField(default=False),
+        ),
+    ]
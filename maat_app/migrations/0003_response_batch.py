@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0002_experiment_batched_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='client_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ResponseBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=64)),
+                ('num_responses', models.IntegerField()),
+                ('date_received', models.DateTimeField(auto_now_add=True)),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.participant')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='responsebatch',
+            constraint=models.UniqueConstraint(fields=('participant', 'batch_id'), name='unique_response_batch'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0003_response_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('claim', models.CharField(blank=True, max_length=32)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+                ('experiment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.experiment')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.participant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0004_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='counterbalance_blocks',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='experiment',
+            name='schedule_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='experiment',
+            name='schedule_seed',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TrialSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('seed', models.BigIntegerField()),
+                ('block_sequence', models.CharField(max_length=255)),
+                ('trial_order', models.BinaryField()),
+                ('experiment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='maat_app.experiment')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trialschedule',
+            constraint=models.UniqueConstraint(fields=('experiment', 'index'), name='unique_trial_schedule'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0005_trial_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cursor', models.IntegerField(default=0)),
+                ('trial_count', models.IntegerField()),
+                ('date_started', models.DateTimeField(auto_now_add=True)),
+                ('date_completed', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='trialschedule',
+            name='unique_trial_schedule',
+        ),
+        migrations.AddField(
+            model_name='experiment',
+            name='schedule_generation',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='trialschedule',
+            name='generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='trialschedule',
+            constraint=models.UniqueConstraint(fields=('experiment', 'generation', 'index'), name='unique_trial_schedule'),
+        ),
+        migrations.AddField(
+            model_name='participantrun',
+            name='experiment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.experiment'),
+        ),
+        migrations.AddField(
+            model_name='participantrun',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.participant'),
+        ),
+        migrations.AddField(
+            model_name='participantrun',
+            name='schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='maat_app.trialschedule'),
+        ),
+    ]
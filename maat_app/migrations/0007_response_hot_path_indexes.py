@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_response_experiment(apps, schema_editor):
+    Response = apps.get_model('maat_app', 'Response')
+    Trial = apps.get_model('maat_app', 'Trial')
+    Response.objects.filter(experiment__isnull=True).update(
+        experiment_id=Subquery(Trial.objects.filter(id=OuterRef('trial_id')).values('experiment_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0006_participant_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='experiment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='maat_app.experiment'),
+        ),
+        migrations.RunPython(backfill_response_experiment, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='response',
+            name='experiment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.experiment'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['experiment', 'participant'], name='response_experiment_part_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trial',
+            index=models.Index(fields=['experiment', 'block_order'], name='trial_experiment_block_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0007_response_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=200)),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField(db_index=True)),
+                ('sample_rate', models.FloatField()),
+                ('requests', models.IntegerField()),
+                ('errors', models.IntegerField(default=0)),
+                ('wall_ms', models.FloatField()),
+                ('wall_ms_max', models.FloatField()),
+                ('wall_histogram', models.JSONField()),
+                ('queries', models.IntegerField()),
+                ('queries_max', models.IntegerField()),
+                ('query_ms', models.FloatField()),
+                ('session_writes', models.IntegerField(default=0)),
+                ('session_bytes', models.BigIntegerField(default=0)),
+                ('session_bytes_max', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
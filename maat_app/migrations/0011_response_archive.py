@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0010_deletion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ResponseArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_response_id', models.BigIntegerField()),
+                ('last_response_id', models.BigIntegerField()),
+                ('response_count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('experiment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='response_archives', to='maat_app.experiment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['experiment', 'first_response_id'], name='archive_experiment_first_idx')],
+            },
+        ),
+    ]
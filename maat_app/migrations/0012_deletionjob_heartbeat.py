@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0011_response_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0012_deletionjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='date_claimed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0013_exportjob_date_claimed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='schedules_assigned',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,118 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min, Subquery
+
+# Responses become unique per (participant, trial). Databases that ran an
+# earlier form of 0007 already have the constraint (their repeated responses
+# were deleted then) or the RepeatedResponse table, so the table and the
+# constraint are only created where they are missing.
+
+UNIQUE_RESPONSE = models.UniqueConstraint(fields=('participant', 'trial'), name='unique_participant_trial_response')
+
+
+def table_exists(schema_editor, model):
+    return model._meta.db_table in schema_editor.connection.introspection.table_names()
+
+
+def constraint_exists(schema_editor, model, name):
+    with schema_editor.connection.cursor() as cursor:
+        return name in schema_editor.connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+
+def create_repeated_response_table(apps, schema_editor):
+    RepeatedResponse = apps.get_model('maat_app', 'RepeatedResponse')
+    if not table_exists(schema_editor, RepeatedResponse):
+        schema_editor.create_model(RepeatedResponse)
+
+
+def drop_repeated_response_table(apps, schema_editor):
+    RepeatedResponse = apps.get_model('maat_app', 'RepeatedResponse')
+    if table_exists(schema_editor, RepeatedResponse):
+        schema_editor.delete_model(RepeatedResponse)
+
+
+def set_aside_repeated_responses(apps, schema_editor):
+    # Keep the first response per (participant, trial) so the unique constraint
+    # can be added; later answers (re-runs of an experiment) move to RepeatedResponse
+    Response = apps.get_model('maat_app', 'Response')
+    RepeatedResponse = apps.get_model('maat_app', 'RepeatedResponse')
+    first_ids = Response.objects.values('participant', 'trial').annotate(first_id=Min('id')).values('first_id')
+    repeated = Response.objects.exclude(id__in=Subquery(first_ids))
+    RepeatedResponse.objects.bulk_create([
+        RepeatedResponse(
+            original_id=response.id,
+            participant_id=response.participant_id,
+            trial_id=response.trial_id,
+            experiment_id=response.experiment_id,
+            response_time=response.response_time,
+            accuracy=response.accuracy,
+            client_timestamp=response.client_timestamp,
+        )
+        for response in repeated.iterator()
+    ], batch_size=1000)
+    repeated.delete()
+
+
+def restore_repeated_responses(apps, schema_editor):
+    Response = apps.get_model('maat_app', 'Response')
+    RepeatedResponse = apps.get_model('maat_app', 'RepeatedResponse')
+    Response.objects.bulk_create([
+        Response(
+            id=repeated.original_id,
+            participant_id=repeated.participant_id,
+            trial_id=repeated.trial_id,
+            experiment_id=repeated.experiment_id,
+            response_time=repeated.response_time,
+            accuracy=repeated.accuracy,
+            client_timestamp=repeated.client_timestamp,
+        )
+        for repeated in RepeatedResponse.objects.iterator()
+    ], batch_size=1000)
+
+
+# SQLite adds and removes the constraint by rebuilding the table from the
+# model, so each runs where the model state already matches the result
+
+
+def add_unique_response_constraint(apps, schema_editor):
+    Response = apps.get_model('maat_app', 'Response')
+    if not constraint_exists(schema_editor, Response, UNIQUE_RESPONSE.name):
+        schema_editor.add_constraint(Response, UNIQUE_RESPONSE)
+
+
+def remove_unique_response_constraint(apps, schema_editor):
+    Response = apps.get_model('maat_app', 'Response')
+    if constraint_exists(schema_editor, Response, UNIQUE_RESPONSE.name):
+        schema_editor.remove_constraint(Response, UNIQUE_RESPONSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maat_app', '0014_experiment_schedules_assigned'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='RepeatedResponse',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('original_id', models.BigIntegerField()),
+                    ('response_time', models.FloatField()),
+                    ('accuracy', models.IntegerField()),
+                    ('client_timestamp', models.DateTimeField(blank=True, null=True)),
+                    ('experiment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.experiment')),
+                    ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.participant')),
+                    ('trial', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='maat_app.trial')),
+                ],
+            ),
+        ]),
+        migrations.RunPython(create_repeated_response_table, drop_repeated_response_table),
+        migrations.RunPython(set_aside_repeated_responses, restore_repeated_responses),
+        migrations.RunPython(migrations.RunPython.noop, remove_unique_response_constraint),
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AddConstraint(model_name='response', constraint=UNIQUE_RESPONSE),
+        ]),
+        migrations.RunPython(add_unique_response_constraint, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,13 @@
+import sys
+from array import array
 from django.db import models
 from django.contrib.auth.models import User
 
+class LiveManager(models.Manager):
+    """Hides rows that are soft-deleted and waiting for the deletion worker to purge them."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Experiment(models.Model):
     experiment_id = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255)
@@ -10,7 +17,20 @@ class Experiment(models.Model):
     text_size = models.IntegerField(default=100)
     text_increase_size = models.IntegerField(default=120)
     text_decrease_size = models.IntegerField(default=80)
+    batched_run = models.BooleanField(default=False)
+    counterbalance_blocks = models.BooleanField(default=False)
+    schedule_seed = models.IntegerField(blank=True, null=True)
+    schedule_count = models.IntegerField(default=0, editable=False)
+    schedule_generation = models.IntegerField(default=0, editable=False)
+    # Runs given a schedule so far; the next run gets schedule index schedules_assigned % schedule_count
+    schedules_assigned = models.IntegerField(default=0, editable=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    # Set once data collection is over; archive_responses then moves its responses out of Response
+    completed_at = models.DateTimeField(blank=True, null=True, editable=False)
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
@@ -19,6 +39,10 @@ class Participant(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     subject_id = models.CharField(max_length=100, unique=True)
     experiments = models.ManyToManyField(Experiment, through='Participation')
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
 class Participation(models.Model):
     participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
@@ -31,11 +55,202 @@ class Trial(models.Model):
     block_name = models.CharField(max_length=50)
     stimuli = models.CharField(max_length=255)
     valence = models.IntegerField()
+    # Non-zero: the fixation before the stimulus lasts a random 500-1500 ms instead of 1000 ms
     random_fixation = models.IntegerField()
     movement = models.IntegerField()
+    # An image or audio stimulus; stimuli then serves as its label
+    asset = models.ForeignKey('StimulusAsset', on_delete=models.PROTECT, blank=True, null=True, related_name='trials')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['experiment', 'block_order'], name='trial_experiment_block_idx'),
+        ]
+
+class StimulusAsset(models.Model):
+    """An image or audio stimulus, stored once under its content hash and never modified."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    extension = models.CharField(max_length=10)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    original_name = models.CharField(max_length=255)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def file_name(self):
+        return f'{self.sha256}{self.extension}'
+
+    def __str__(self):
+        return f'{self.original_name} ({self.sha256[:12]})'
+
+class TrialSchedule(models.Model):
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE, related_name='schedules')
+    generation = models.IntegerField(default=0)
+    index = models.IntegerField()
+    seed = models.BigIntegerField()
+    block_sequence = models.CharField(max_length=255)
+    # Trial ids in presentation order, packed as little-endian int64
+    trial_order = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['experiment', 'generation', 'index'], name='unique_trial_schedule'),
+        ]
+
+    def trial_ids(self):
+        order = array('q')
+        order.frombytes(bytes(self.trial_order))
+        if sys.byteorder == 'big':
+            order.byteswap()
+        return order.tolist()
+
+class ParticipantRun(models.Model):
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE)
+    schedule = models.ForeignKey(TrialSchedule, on_delete=models.CASCADE, related_name='runs')
+    cursor = models.IntegerField(default=0)
+    trial_count = models.IntegerField()
+    date_started = models.DateTimeField(auto_now_add=True)
+    date_completed = models.DateTimeField(blank=True, null=True)
 
 class Response(models.Model):
     participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
     trial = models.ForeignKey(Trial, on_delete=models.CASCADE)
+    # Copy of trial.experiment so per-experiment queries skip the Trial join
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE)
     response_time = models.FloatField()
-    accuracy = models.IntegerField()
\ No newline at end of file
+    accuracy = models.IntegerField()
+    client_timestamp = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['participant', 'trial'], name='unique_participant_trial_response'),
+        ]
+        indexes = [
+            models.Index(fields=['experiment', 'participant'], name='response_experiment_part_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.experiment_id is None:
+            self.experiment_id = self.trial.experiment_id
+        super().save(*args, **kwargs)
+
+class RepeatedResponse(models.Model):
+    """
+    An answer to a trial the participant had already answered, recorded
+    before responses were made unique per (participant, trial); migration
+    0015 moved these here instead of deleting them.
+    """
+    original_id = models.BigIntegerField()
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
+    trial = models.ForeignKey(Trial, on_delete=models.CASCADE)
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE)
+    response_time = models.FloatField()
+    accuracy = models.IntegerField()
+    client_timestamp = models.DateTimeField(blank=True, null=True)
+
+class ResponseArchive(models.Model):
+    """A block of a completed experiment's responses moved out of Response, packed column-wise by archive.py."""
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE, related_name='response_archives')
+    first_response_id = models.BigIntegerField()
+    last_response_id = models.BigIntegerField()
+    response_count = models.IntegerField()
+    data = models.BinaryField()
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['experiment', 'first_response_id'], name='archive_experiment_first_idx'),
+        ]
+
+class ResponseBatch(models.Model):
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
+    batch_id = models.CharField(max_length=64)
+    num_responses = models.IntegerField()
+    date_received = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['participant', 'batch_id'], name='unique_response_batch'),
+        ]
+
+class ExportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE)
+    experiment = models.ForeignKey(Experiment, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    claim = models.CharField(max_length=32, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    # When a worker claimed the job; one left running far longer is queued again
+    date_claimed = models.DateTimeField(blank=True, null=True)
+    date_finished = models.DateTimeField(blank=True, null=True)
+
+class DeletionJob(models.Model):
+    """Purge of a soft-deleted experiment or participant, run by the deletion worker."""
+    EXPERIMENT = 'experiment'
+    PARTICIPANT = 'participant'
+    KIND_CHOICES = [
+        (EXPERIMENT, 'Experiment'),
+        (PARTICIPANT, 'Participant'),
+    ]
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Not a foreign key: the row it names is gone once the job is done
+    object_id = models.BigIntegerField()
+    label = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    claim = models.CharField(max_length=32, blank=True)
+    rows_total = models.BigIntegerField(default=0)
+    rows_deleted = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    # Set when claimed and after every batch; a running job whose heartbeat
+    # stops (its worker was killed) is queued again
+    heartbeat = models.DateTimeField(blank=True, null=True)
+    date_finished = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 100
+        return min(100 * self.rows_deleted // self.rows_total, 99) if self.rows_total else 0
+
+class RequestProfile(models.Model):
+    """Per-view statistics of the sampled requests in one flush of a process's instrumentation buffer."""
+    view = models.CharField(max_length=200)
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField(db_index=True)
+    sample_rate = models.FloatField()
+    requests = models.IntegerField()
+    errors = models.IntegerField(default=0)
+    wall_ms = models.FloatField()
+    wall_ms_max = models.FloatField()
+    # Request counts per bucket of instrumentation.WALL_BUCKETS_MS, overflow last
+    wall_histogram = models.JSONField()
+    queries = models.IntegerField()
+    queries_max = models.IntegerField()
+    query_ms = models.FloatField()
+    session_writes = models.IntegerField(default=0)
+    session_bytes = models.BigIntegerField(default=0)
+    session_bytes_max = models.IntegerField(default=0)
@@ -0,0 +1,135 @@
+import csv
+import re
+from collections import Counter
+from urllib.parse import urlencode
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from .dashboard import bump_dashboard_version
+from .exports import Echo
+from .models import Participant, Participation
+
+# S{001..250} expands to S001 ... S250, keeping the zero padding of the start
+RANGE_PATTERN = re.compile(r'^(?P<prefix>[^{}]*)\{(?P<start>\d+)\.\.(?P<end>\d+)\}(?P<suffix>[^{}]*)$')
+SUBJECT_ID_MAX_LENGTH = Participant._meta.get_field('subject_id').max_length
+CREDENTIALS_HEADER = ['Participant ID', 'Experiment ID', 'Login URL']
+PROVISION_CHUNK_SIZE = 1000
+
+
+def chunked(items, size=PROVISION_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def expand_subject_ids(text):
+    """
+    Subject ids from whitespace or comma separated text, where an item may
+    be a range pattern such as S{001..250}. Order is kept; repeats are errors.
+    """
+    subject_ids = []
+    for item in re.split(r'[\s,]+', text.strip()):
+        if not item:
+            continue
+        match = RANGE_PATTERN.match(item)
+        if match is None:
+            subject_ids.append(item)
+            continue
+        start, end = int(match['start']), int(match['end'])
+        if end < start:
+            raise ValidationError(f'{item}: the range end is before its start')
+        if len(subject_ids) + end - start + 1 > settings.MAAT_PROVISION_MAX_PARTICIPANTS:
+            raise ValidationError(f'At most {settings.MAAT_PROVISION_MAX_PARTICIPANTS} participants per batch')
+        width = len(match['start'])
+        subject_ids.extend(f"{match['prefix']}{number:0{width}d}{match['suffix']}" for number in range(start, end + 1))
+    return subject_ids
+
+
+def valid_username(subject_id):
+    try:
+        User.username_validator(subject_id)
+    except ValidationError:
+        return False
+    return True
+
+
+def check_subject_ids(subject_ids):
+    if not subject_ids:
+        raise ValidationError('No participant ids given')
+    if len(subject_ids) > settings.MAAT_PROVISION_MAX_PARTICIPANTS:
+        raise ValidationError(f'At most {settings.MAAT_PROVISION_MAX_PARTICIPANTS} participants per batch')
+    errors = []
+    too_long = [subject_id for subject_id in subject_ids if len(subject_id) > SUBJECT_ID_MAX_LENGTH]
+    if too_long:
+        errors.append(f'Longer than {SUBJECT_ID_MAX_LENGTH} characters: {", ".join(too_long[:10])}')
+    # Each id is also a username, which bulk_create does not validate
+    invalid = [subject_id for subject_id in subject_ids if not valid_username(subject_id)]
+    if invalid:
+        errors.append(f'Only letters, digits and @.+-_ allowed: {", ".join(invalid[:10])}')
+    repeated = [subject_id for subject_id, count in Counter(subject_ids).items() if count > 1]
+    if repeated:
+        errors.append(f'Listed more than once: {", ".join(repeated[:10])}')
+    taken = set()
+    for chunk in chunked(subject_ids):
+        taken.update(Participant.all_objects.filter(subject_id__in=chunk).values_list('subject_id', flat=True))
+        taken.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+    if taken:
+        errors.append(f'Already registered: {", ".join(sorted(taken)[:10])}{" ..." if len(taken) > 10 else ""}')
+    if errors:
+        raise ValidationError(errors)
+
+
+def provision_participants(subject_ids, experiment=None):
+    """
+    Register participants in bulk: a User with an unusable password (so no
+    password hashing) and a Participant for each id, and a Participation in
+    experiment if given, all in one transaction. Raises ValidationError,
+    creating nothing, if any id is invalid or taken.
+    """
+    check_subject_ids(subject_ids)
+    # One unusable hash shared by the batch; make_password(None) skips the hasher
+    password = make_password(None)
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=subject_id, password=password) for subject_id in subject_ids],
+                batch_size=PROVISION_CHUNK_SIZE
+            )
+            user_ids = {}
+            for chunk in chunked(subject_ids):
+                user_ids.update(User.objects.filter(username__in=chunk).values_list('username', 'id'))
+            Participant.objects.bulk_create(
+                [Participant(user_id=user_ids[subject_id], subject_id=subject_id) for subject_id in subject_ids],
+                batch_size=PROVISION_CHUNK_SIZE
+            )
+            if experiment is not None:
+                participant_ids = []
+                for chunk in chunked(subject_ids):
+                    participant_ids.extend(Participant.objects.filter(subject_id__in=chunk).values_list('id', flat=True))
+                Participation.objects.bulk_create(
+                    [Participation(participant_id=participant_id, experiment=experiment) for participant_id in participant_ids],
+                    batch_size=PROVISION_CHUNK_SIZE
+                )
+    except IntegrityError:
+        raise ValidationError('Some of these participant ids were registered meanwhile; nothing was created')
+    # bulk_create sends no post_save signals
+    bump_dashboard_version()
+    return subject_ids
+
+
+def credential_rows(subject_ids, experiment, login_url):
+    """(subject id, experiment id, login URL) rows; the URL fills in the login form."""
+    experiment_id = experiment.experiment_id if experiment is not None else ''
+    for subject_id in subject_ids:
+        query = {'participant_id': subject_id}
+        if experiment_id:
+            query['experiment_id'] = experiment_id
+        yield subject_id, experiment_id, f'{login_url}?{urlencode(query)}'
+
+
+def credential_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CREDENTIALS_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import json_script
+
+# The trial pages differ between requests only in their CSRF token and
+# their JSON payload. Each is rendered once per process with placeholders
+# in both spots and later filled in by string joins, so a trial costs no
+# template rendering. With DEBUG on the shell is rendered every time, so
+# template edits show up straight away.
+
+CSRF_PLACEHOLDER = 'maat-csrf-token-placeholder'
+PAYLOAD_PLACEHOLDER = 'maat-payload-placeholder'
+PAYLOAD_ELEMENT_ID = 'trial-payload'
+
+_shells = {}
+
+
+def render_shell(template_name):
+    """The template split into (before the token, between token and payload, after the payload)."""
+    html = render_to_string(template_name, {'csrf_token': CSRF_PLACEHOLDER, 'payload': PAYLOAD_PLACEHOLDER})
+    head, _, rest = html.partition(CSRF_PLACEHOLDER)
+    middle, _, tail = rest.partition(json_script(PAYLOAD_PLACEHOLDER, PAYLOAD_ELEMENT_ID))
+    if not tail or CSRF_PLACEHOLDER in tail:
+        raise ValueError(f'{template_name} must use {{% csrf_token %}} once, before {{{{ payload|json_script }}}}')
+    return head, middle, tail
+
+
+def shell(template_name):
+    if settings.DEBUG:
+        return render_shell(template_name)
+    if template_name not in _shells:
+        _shells[template_name] = render_shell(template_name)
+    return _shells[template_name]
+
+
+def render_trial_page(request, template_name, payload):
+    """Respond with a trial page shell filled in with the request's CSRF token and the payload."""
+    head, middle, tail = shell(template_name)
+    return HttpResponse(''.join((head, get_token(request), middle, json_script(payload, PAYLOAD_ELEMENT_ID), tail)))
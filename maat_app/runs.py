@@ -0,0 +1,162 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .ingest import InvalidBatch, ingest_responses, score_response
+from .models import ParticipantRun, Response as ParticipantResponse
+from .schedules import schedule_for
+
+RUN_STATE_TIMEOUT = 6 * 60 * 60
+
+
+def run_state_key(run_id):
+    return f'maat:run:{run_id}'
+
+
+def experiment_params(experiment):
+    return {
+        'text_size': experiment.text_size,
+        'text_increase_size': experiment.text_increase_size,
+        'text_decrease_size': experiment.text_decrease_size,
+    }
+
+
+def start_run(participant, experiment):
+    """
+    Resume the participant's unfinished run on this experiment or start a
+    new one on the next schedule. Only the returned run's id needs to live
+    in the session. Returns None when there is nothing to run: the
+    experiment has no trials, or the participant has completed a run
+    (responses are unique per (participant, trial), so a second run could
+    save nothing).
+    """
+    run = ParticipantRun.objects.filter(participant=participant, experiment=experiment).order_by('-id').first()
+    if run is not None and run.date_completed is not None:
+        if run.cursor >= run.trial_count:
+            return None
+        # Marked completed before its last trial was answered; resume it
+        ParticipantRun.objects.filter(id=run.id).update(date_completed=None)
+    if run is None:
+        schedule = schedule_for(experiment)
+        if schedule is None:
+            return None
+        trial_ids = schedule.trial_ids()
+        run = ParticipantRun.objects.create(
+            participant=participant, experiment=experiment, schedule=schedule, trial_count=len(trial_ids)
+        )
+        cache.set(run_state_key(run.id), {
+            'participant_id': participant.id,
+            'experiment_id': experiment.id,
+            'trial_ids': trial_ids,
+            'params': experiment_params(experiment),
+        }, RUN_STATE_TIMEOUT)
+    return run
+
+
+def state_from_run(run):
+    return {
+        'participant_id': run.participant_id,
+        'experiment_id': run.experiment_id,
+        'trial_ids': run.schedule.trial_ids(),
+        'params': experiment_params(run.experiment),
+    }
+
+
+def run_state(run_id):
+    """
+    The run's fixed state (participant, experiment, trial order and display
+    parameters), read through the cache so the hot path skips the schedule.
+    Returns None for an unknown run.
+    """
+    state = cache.get(run_state_key(run_id))
+    if state is None:
+        run = ParticipantRun.objects.select_related('experiment', 'schedule').filter(id=run_id).first()
+        if run is None:
+            return None
+        state = state_from_run(run)
+        cache.set(run_state_key(run_id), state, RUN_STATE_TIMEOUT)
+    return state
+
+
+def forget_runs(run_ids):
+    cache.delete_many([run_state_key(run_id) for run_id in run_ids])
+
+
+async def arun_state(run_id):
+    state = await cache.aget(run_state_key(run_id))
+    if state is None:
+        run = await ParticipantRun.objects.select_related('experiment', 'schedule').filter(id=run_id).afirst()
+        if run is None:
+            return None
+        state = state_from_run(run)
+        await cache.aset(run_state_key(run_id), state, RUN_STATE_TIMEOUT)
+    return state
+
+
+def run_cursor(run_id):
+    return ParticipantRun.objects.filter(id=run_id).values_list('cursor', flat=True).first()
+
+
+async def arun_cursor(run_id):
+    return await ParticipantRun.objects.filter(id=run_id).values_list('cursor', flat=True).afirst()
+
+
+def advance_run(run_id, steps=1, cursor=None):
+    """
+    Move the cursor past `steps` answered trials. Given the expected `cursor`,
+    only advance if it has not moved, so a repeated submission of the same
+    trial cannot skip the next one.
+    """
+    runs = ParticipantRun.objects.filter(id=run_id)
+    if cursor is not None:
+        runs = runs.filter(cursor=cursor)
+    return runs.update(cursor=F('cursor') + steps)
+
+
+def record_response(run_id, cursor, participant_id, trial, response_time, response_key):
+    """Save the answer to the trial at `cursor` and advance the run past it."""
+    with transaction.atomic():
+        # A concurrent duplicate finds the cursor already moved and saves nothing
+        if advance_run(run_id, cursor=cursor):
+            ParticipantResponse.objects.bulk_create([ParticipantResponse(
+                participant_id=participant_id,
+                trial_id=trial.id,
+                experiment_id=trial.experiment_id,
+                response_time=response_time,
+                accuracy=score_response(trial, response_key)
+            )], ignore_conflicts=True)
+
+
+def record_responses(run_id, cursor, state, batch_id, records, trials):
+    """
+    Save a batch answering the trials from `cursor` on and advance the run
+    past the rows it inserted. Returns ``(num_saved, duplicate)``.
+    """
+    with transaction.atomic():
+        saved, duplicate = ingest_responses(
+            state['participant_id'], batch_id, records, state['trial_ids'], trials,
+            expected_trial_ids=state['trial_ids'][cursor:cursor + len(records)]
+        )
+        # Another batch that moved the cursor meanwhile rolls this one back
+        if saved and not advance_run(run_id, steps=saved, cursor=cursor):
+            raise InvalidBatch('Responses do not follow the trial order')
+    return saved, duplicate
+
+
+# transaction.atomic() has no async form, so the write runs in a worker thread
+arecord_response = sync_to_async(record_response)
+
+
+def completable_runs(run_id):
+    # A run is only completed once every trial of it has been answered
+    return ParticipantRun.objects.filter(id=run_id, date_completed__isnull=True, cursor__gte=F('trial_count'))
+
+
+def complete_run(run_id):
+    """Mark the run completed; returns whether this call completed it."""
+    return bool(completable_runs(run_id).update(date_completed=timezone.now()))
+
+
+async def acomplete_run(run_id):
+    return bool(await completable_runs(run_id).aupdate(date_completed=timezone.now()))
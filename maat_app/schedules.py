@@ -0,0 +1,153 @@
+import random
+import sys
+from array import array
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .metadata import forget_experiment
+from .models import Experiment, Trial, TrialSchedule
+
+
+def pack_trial_ids(trial_ids):
+    order = array('q', trial_ids)
+    if sys.byteorder == 'big':
+        order.byteswap()
+    return order.tobytes()
+
+
+def balanced_latin_square(size):
+    """
+    Rows of a Williams design: every block appears once in each position and,
+    for an even size, each block follows every other block equally often.
+    Odd sizes need the mirrored rows as well.
+    """
+    rows = []
+    for row in range(size):
+        sequence = []
+        for position in range(size):
+            if position % 2 == 0:
+                sequence.append((row + position // 2) % size)
+            else:
+                sequence.append((row + size - (position + 1) // 2) % size)
+        rows.append(sequence)
+    if size % 2:
+        rows += [list(reversed(sequence)) for sequence in rows]
+    return rows
+
+
+def group_blocks(experiment):
+    """Trial ids grouped into blocks, blocks ordered by block_order."""
+    blocks = {}
+    trials = Trial.objects.filter(experiment=experiment).order_by('block_order', 'block_name', 'id')
+    for trial_id, block_order, block_name in trials.values_list('id', 'block_order', 'block_name'):
+        blocks.setdefault((block_order, block_name), []).append(trial_id)
+    return list(blocks.values())
+
+
+def build_schedule_order(blocks, block_sequence, seed):
+    rng = random.Random(seed)
+    order = []
+    for block_index in block_sequence:
+        block = list(blocks[block_index])
+        rng.shuffle(block)
+        order.extend(block)
+    return order
+
+
+def build_schedules(experiment):
+    """
+    Precompute the experiment's trial schedules: trials shuffled within each
+    block from a per-schedule seed, blocks in block_order or, when
+    counterbalancing, permuted by the rows of a balanced Latin square.
+    Returns the number of schedules.
+    """
+    blocks = group_blocks(experiment)
+    if not blocks:
+        return 0
+    if experiment.counterbalance_blocks:
+        block_sequences = balanced_latin_square(len(blocks))
+    else:
+        block_sequences = [list(range(len(blocks)))]
+    rows = len(block_sequences)
+    count = rows * -(-settings.MAAT_SCHEDULES_PER_EXPERIMENT // rows)
+
+    base_seed = experiment.schedule_seed
+    if base_seed is None:
+        base_seed = random.SystemRandom().randrange(2 ** 31)
+    generation = experiment.schedule_generation + 1
+    schedules = []
+    for index in range(count):
+        seed = base_seed + index
+        block_sequence = block_sequences[index % rows]
+        schedules.append(TrialSchedule(
+            experiment=experiment,
+            generation=generation,
+            index=index,
+            seed=seed,
+            block_sequence=','.join(str(block) for block in block_sequence),
+            trial_order=pack_trial_ids(build_schedule_order(blocks, block_sequence, seed))
+        ))
+
+    with transaction.atomic():
+        # Concurrent first session starts race to build: the conditional UPDATE
+        # lets one of them claim the generation and the rest reuse its schedules
+        claimed = Experiment.objects.filter(id=experiment.id, schedule_generation=generation - 1).update(
+            schedule_seed=base_seed, schedule_count=count, schedule_generation=generation
+        )
+        if not claimed:
+            experiment.refresh_from_db(fields=['schedule_seed', 'schedule_count', 'schedule_generation'])
+            # The copy this request started from was stale
+            forget_experiment(experiment.id)
+            return experiment.schedule_count
+        TrialSchedule.objects.bulk_create(schedules)
+        # Older generations stay only as long as a participant run still follows them
+        TrialSchedule.objects.filter(experiment=experiment, generation__lt=generation, runs__isnull=True).delete()
+    forget_experiment(experiment.id)
+    experiment.schedule_seed = base_seed
+    experiment.schedule_count = count
+    experiment.schedule_generation = generation
+    return count
+
+
+def invalidate_schedules(experiment_id):
+    # The next session start rebuilds; schedules of runs in progress are kept
+    Experiment.objects.filter(id=experiment_id).update(schedule_count=0)
+    forget_experiment(experiment_id)
+
+
+def next_schedule_index(experiment):
+    """
+    The next run's ordinal among the experiment's runs. Participant ids are
+    shared by all experiments, so they would not walk one experiment's
+    Latin square rows in turn.
+    """
+    experiments = Experiment.objects.filter(id=experiment.id)
+    with transaction.atomic():
+        # The UPDATE holds the row until commit, so concurrent starts get distinct ordinals
+        experiments.update(schedules_assigned=F('schedules_assigned') + 1)
+        return experiments.values_list('schedules_assigned', flat=True).get() - 1
+
+
+def schedule_for(experiment):
+    """
+    The schedule for a new run of the experiment, one indexed lookup once
+    built. Consecutive runs walk through the Latin square rows in turn.
+    """
+    if not experiment.schedule_count and not build_schedules(experiment):
+        return None
+    ordinal = next_schedule_index(experiment)
+    try:
+        return TrialSchedule.objects.get(
+            experiment=experiment,
+            generation=experiment.schedule_generation,
+            index=ordinal % experiment.schedule_count
+        )
+    except TrialSchedule.DoesNotExist:
+        # Rebuilt by another request since the experiment row was read
+        if not build_schedules(experiment):
+            return None
+        return TrialSchedule.objects.get(
+            experiment=experiment,
+            generation=experiment.schedule_generation,
+            index=ordinal % experiment.schedule_count
+        )
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .dashboard import bump_dashboard_version
+from .metadata import forget_experiment, forget_participant, forget_trials
+from .models import Experiment, Participant, Participation, Trial
+from .schedules import invalidate_schedules
+
+
+@receiver([post_save, post_delete], sender=Experiment)
+@receiver([post_save, post_delete], sender=Participant)
+@receiver([post_save, post_delete], sender=Participation)
+@receiver([post_save, post_delete], sender=Trial)
+def invalidate_dashboard(sender, **kwargs):
+    bump_dashboard_version()
+
+
+@receiver(post_save, sender=Experiment)
+def invalidate_experiment_schedules(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_schedules(instance.id)
+
+
+@receiver(pre_save, sender=Trial)
+def remember_trial_experiment(sender, instance, **kwargs):
+    # A trial moved to another experiment also changes the one it leaves
+    if instance.pk is not None:
+        instance._previous_experiment_id = Trial.objects.filter(pk=instance.pk).values_list(
+            'experiment_id', flat=True
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=Trial)
+def invalidate_trial_schedules(sender, instance, **kwargs):
+    for experiment_id in {instance.experiment_id, getattr(instance, '_previous_experiment_id', None)} - {None}:
+        invalidate_schedules(experiment_id)
+        forget_trials(experiment_id)
+
+
+@receiver([post_save, post_delete], sender=Experiment)
+def invalidate_experiment_metadata(sender, instance, **kwargs):
+    forget_experiment(instance.pk)
+    forget_trials(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def invalidate_participant_metadata(sender, instance, **kwargs):
+    forget_participant(instance.pk)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.MAAT_SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
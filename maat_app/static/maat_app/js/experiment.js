@@ -0,0 +1,32 @@
+const payload = JSON.parse(document.getElementById('trial-payload').textContent);
+const trial = payload.trial;
+let stimulusElement = document.getElementById('stimulus');
+let startTime = null;
+
+function captureResponse(event) {
+    const validKeys = ['Y', 'N'];
+    const key = event.key.toUpperCase();
+    // Keys pressed before onset or after the first response are ignored
+    if (startTime === null || !validKeys.includes(key)) {
+        return;
+    }
+    const responseTime = event.timeStamp - startTime;
+    startTime = null;
+    document.getElementById('response-time').value = responseTime.toFixed(2);
+    document.getElementById('response-key').value = key;
+    document.getElementById('cursor').value = payload.cursor;
+    showFeedback(stimulusElement, key, payload.params, () => {
+        document.getElementById('response-form').submit();
+    });
+}
+
+window.addEventListener('keydown', captureResponse);
+
+window.onload = function() {
+    // The first trial of a run loads every asset of the run; later pages find them cached
+    preloadAssets(payload.preload.concat([trial.asset]), stimulusElement)
+        .then(() => trial.asset ? loadAsset(trial.asset) : null)
+        .then((media) => presentStimulus(stimulusElement, trial, payload.params, media, (onset) => {
+            startTime = onset;
+        }));
+};
@@ -0,0 +1,145 @@
+const payload = JSON.parse(document.getElementById('trial-payload').textContent);
+const runner = document.getElementById('runner');
+const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+let stimulusElement = document.getElementById('stimulus');
+let trialIndex = 0;
+let startTime = null;
+let pending = [];
+let pendingFirst = null;
+let outbox = [];
+let inFlight = null;
+let stopped = false;
+const runToken = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+let batchSequence = 0;
+
+// first is the run position (server cursor) of the batch's first response
+function makeBatch(first, responses) {
+    const batch = {batch_id: runToken + '-' + batchSequence, first: first, responses: responses};
+    batchSequence += 1;
+    return batch;
+}
+
+function queueBatch() {
+    if (pending.length > 0) {
+        outbox.push(makeBatch(pendingFirst, pending));
+        pending = [];
+    }
+}
+
+// After a rejection, keep the held responses the server's cursor says it
+// still needs and send them again under new batch ids. When that cannot
+// line up, the page is reloaded and the run resumes from the server cursor,
+// presenting again the trials whose responses were not saved.
+function resync(serverCursor) {
+    const held = [];
+    outbox.forEach((batch) => batch.responses.forEach((response, i) => {
+        held.push({position: batch.first + i, response: response});
+    }));
+    const first = held[0].position;
+    if (typeof serverCursor === 'number' && serverCursor > first && serverCursor <= first + held.length) {
+        const kept = held.filter((entry) => entry.position >= serverCursor);
+        outbox = [];
+        for (let i = 0; i < kept.length; i += payload.batch_size) {
+            outbox.push(makeBatch(kept[i].position, kept.slice(i, i + payload.batch_size).map((entry) => entry.response)));
+        }
+        return;
+    }
+    stopped = true;
+    window.removeEventListener('keydown', captureResponse);
+    stimulusElement.innerText = 'Some responses could not be saved. The experiment will continue from the last saved trial.';
+    setTimeout(() => window.location.reload(), 3000);
+}
+
+// Batches keep their id across retries so the server can drop duplicates
+function sendBatches() {
+    if (inFlight || outbox.length === 0 || stopped) {
+        return inFlight || Promise.resolve();
+    }
+    inFlight = fetch(runner.dataset.saveUrl, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken},
+        body: JSON.stringify({batch_id: outbox[0].batch_id, responses: outbox[0].responses}),
+        keepalive: true,
+    }).then((response) => {
+        // Server errors are retried; a rejected batch would be rejected again
+        if (response.status >= 500) {
+            throw new Error(response.statusText);
+        }
+        if (response.ok) {
+            outbox.shift();
+            return null;
+        }
+        return response.json().then((body) => body.cursor, () => null).then(resync);
+    }).catch(() => {
+        // Leave the batch at the head of the outbox for the next attempt
+    }).finally(() => {
+        inFlight = null;
+    });
+    return inFlight;
+}
+
+async function finishExperiment() {
+    queueBatch();
+    while (outbox.length > 0 && !stopped) {
+        const remaining = outbox.length;
+        await sendBatches();
+        if (outbox.length === remaining) {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+    }
+    if (!stopped) {
+        window.location.href = runner.dataset.completeUrl;
+    }
+}
+
+function showTrial() {
+    if (stopped) {
+        return;
+    }
+    if (trialIndex >= payload.trials.length) {
+        finishExperiment();
+        return;
+    }
+    const trial = payload.trials[trialIndex];
+    Promise.resolve(trial.asset ? loadAsset(trial.asset) : null).then((media) => {
+        presentStimulus(stimulusElement, trial, payload.params, media, (onset) => {
+            startTime = onset;
+        });
+    });
+}
+
+function captureResponse(event) {
+    const validKeys = ['Y', 'N'];
+    const key = event.key.toUpperCase();
+    // Keys pressed before onset or after the first response are ignored
+    if (startTime === null || !validKeys.includes(key)) {
+        return;
+    }
+    const responseTime = event.timeStamp - startTime;
+    startTime = null;
+    if (pending.length === 0) {
+        pendingFirst = payload.cursor + trialIndex;
+    }
+    pending.push({
+        trial_id: payload.trials[trialIndex].id,
+        response_key: key,
+        response_time: responseTime.toFixed(2),
+        client_timestamp: Date.now(),
+    });
+
+    if (pending.length >= payload.batch_size) {
+        queueBatch();
+        sendBatches();
+    }
+    showFeedback(stimulusElement, key, payload.params, () => {
+        trialIndex += 1;
+        showTrial();
+    });
+}
+
+window.addEventListener('keydown', captureResponse);
+
+// Every media stimulus of the run is loaded before the first trial starts
+window.onload = function() {
+    preloadAssets(payload.trials.map((trial) => trial.asset), stimulusElement).then(showTrial);
+};
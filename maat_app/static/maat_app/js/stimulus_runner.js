@@ -0,0 +1,102 @@
+// Shared by experiment.js and experiment_batch.js. Media stimuli are
+// loaded and decoded before their trial starts, and every change the
+// participant sees is made inside requestAnimationFrame so the reported
+// onset is the frame the stimulus was drawn in.
+const DEFAULT_FIXATION_MS = 1000;
+// Trial.random_fixation is a flag: when set, the fixation lasts a random
+// time in this range, so the stimulus onset cannot be anticipated
+const RANDOM_FIXATION_MS = [500, 1500];
+const FEEDBACK_MS = 1000;
+const loadedAssets = new Map();
+
+function loadAsset(asset) {
+    if (!loadedAssets.has(asset.url)) {
+        let loading;
+        if (asset.kind === 'image') {
+            const image = new Image();
+            image.src = asset.url;
+            loading = image.decode().then(() => image);
+        } else {
+            // A blob URL keeps the whole file in memory, so playback cannot stall on the network
+            loading = fetch(asset.url).then((response) => {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.blob();
+            }).then((blob) => new Promise((resolve, reject) => {
+                const audio = new Audio();
+                audio.preload = 'auto';
+                audio.addEventListener('canplaythrough', () => resolve(audio), {once: true});
+                audio.addEventListener('error', reject, {once: true});
+                audio.src = URL.createObjectURL(blob);
+                audio.load();
+            }));
+        }
+        loadedAssets.set(asset.url, loading);
+    }
+    return loadedAssets.get(asset.url);
+}
+
+function preloadAssets(assets, element) {
+    const unique = [...new Map(assets.filter(Boolean).map((asset) => [asset.url, asset])).values()];
+    if (unique.length === 0) {
+        return Promise.resolve();
+    }
+    let loaded = 0;
+    element.innerText = 'Loading stimuli 0/' + unique.length;
+    return Promise.all(unique.map((asset) => loadAsset(asset).then(() => {
+        loaded += 1;
+        element.innerText = 'Loading stimuli ' + loaded + '/' + unique.length;
+    }))).then(() => {
+        element.innerText = '';
+    }, (error) => {
+        element.innerText = 'The stimuli could not be loaded. Please reload the page.';
+        throw error;
+    });
+}
+
+function fixationDuration(trial) {
+    if (!trial.random_fixation) {
+        return DEFAULT_FIXATION_MS;
+    }
+    const [shortest, longest] = RANDOM_FIXATION_MS;
+    return shortest + Math.random() * (longest - shortest);
+}
+
+// Show a fixation cross, then the stimulus on the first frame due after the
+// fixation duration. onShown receives that frame's timestamp, which is on the
+// same clock as event.timeStamp.
+function presentStimulus(element, trial, params, media, onShown) {
+    requestAnimationFrame((fixationStart) => {
+        element.style.transform = '';
+        element.style.fontSize = params.text_size + '%';
+        element.replaceChildren('+');
+        const onsetDue = fixationStart + fixationDuration(trial);
+        function frame(now) {
+            // Swap on the frame closest to the due time rather than the first one after it
+            if (now < onsetDue - 8) {
+                requestAnimationFrame(frame);
+                return;
+            }
+            if (media instanceof HTMLImageElement) {
+                element.replaceChildren(media);
+            } else if (media instanceof HTMLAudioElement) {
+                element.replaceChildren(trial.stimuli);
+                media.currentTime = 0;
+                media.play();
+            } else {
+                element.replaceChildren(trial.stimuli);
+            }
+            onShown(now);
+        }
+        requestAnimationFrame(frame);
+    });
+}
+
+// Resize the stimulus to the response's feedback size straight away; a
+// scale rather than a font size so image stimuli change size too
+function showFeedback(element, key, params, onDone) {
+    const target = (key === 'Y' ? params.text_increase_size : params.text_decrease_size) / params.text_size;
+    element.style.transform = 'scale(' + target + ')';
+    setTimeout(onDone, FEEDBACK_MS);
+}
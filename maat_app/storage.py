@@ -0,0 +1,28 @@
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+
+class AtomicFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage whose files appear complete or not at all: each is
+    written under a hidden temporary name in its directory and renamed into
+    place, so readers on other processes or hosts never see a partial file.
+    """
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            # mkstemp creates the file readable by its owner only
+            os.chmod(temp_path, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return os.path.relpath(full_path, self.location).replace('\\', '/')
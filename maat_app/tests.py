@@ -1,3 +1,978 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import post_delete
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from . import async_views, deletion, exports, instrumentation, rendering, urls
+from .management.commands import benchmark_queries, loadtest_writes
+from .analytics import summarize_experiment
+from .archive import archive_experiment, response_values
+from .assets import ASSET_CACHE_CONTROL, store_asset
+from .columnar import export_columnar, read_columnar
+from .dashboard import DASHBOARD_PAGE_SIZE, experiment_summaries
+from .export_queue import claim_jobs, export_experiment_batch, requeue_stale
+from .exports import (
+    EXPORT_COLUMNS, EXPORT_HEADER, MANIFEST_FILENAME, refresh_manifest, response_rows, results_storage, save_csv
+)
+from .ingest import ingest_responses
+from .loadtest import PAYLOAD_PATTERN, create_fixture, find_regressions
+from .metadata import experiment_trials, get_experiment, participant_or_404
+from .models import (
+    DeletionJob, Experiment, ExportJob, Participant, ParticipantRun, Participation, RequestProfile, Response, Trial
+)
+from .provisioning import provision_participants
+from .runs import run_cursor, start_run
+from .schedules import balanced_latin_square, build_schedules
+from .storage import AtomicFileSystemStorage
+from .trial_import import import_trials
 
-# Create your tests here.
+
+class CacheClearingTestCase(TestCase):
+    # Cached experiments, trials and run state would outlive the rolled-back rows
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+
+def temporary_storages(test, *aliases):
+    """Point the given STORAGES aliases at a directory removed after the test."""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    backends = {**settings.STORAGES}
+    for alias in aliases:
+        backends[alias] = {**backends[alias], 'OPTIONS': {'location': f'{directory}/{alias}'}}
+    override = override_settings(STORAGES=backends)
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+def finish_run(client, participant_id, experiment):
+    """Answer every trial of a single-trial run through the participant views."""
+    client.get(reverse('start_experiment', args=[participant_id, experiment.id]))
+    while client.get(reverse('run_trial')).status_code == 200:
+        client.post(reverse('save_response'), {'response_time': '500.0', 'response_key': 'Y'})
+
+
+class ScheduleTests(CacheClearingTestCase):
+    def test_latin_square_covers_every_position(self):
+        for size in (2, 3, 4, 5):
+            rows = balanced_latin_square(size)
+            self.assertEqual(len(rows), size * 2 if size % 2 else size)
+            for row in rows:
+                self.assertEqual(sorted(row), list(range(size)))
+            for position in range(size):
+                column = [row[position] for row in rows]
+                self.assertEqual(len(set(column)), size)
+                # Mirrored rows put each block in every position twice
+                self.assertEqual(column.count(0), 2 if size % 2 else 1)
+
+    def test_even_latin_square_balances_successors(self):
+        rows = balanced_latin_square(4)
+        pairs = [(row[i], row[i + 1]) for row in rows for i in range(len(row) - 1)]
+        self.assertEqual(len(set(pairs)), len(pairs))
+
+    def test_same_seed_gives_same_order(self):
+        _, experiment, _ = create_fixture(participants=0, trials=12, blocks=3, counterbalance=True, experiments=1)
+        experiment.schedule_seed = 1234
+        experiment.save()
+        build_schedules(experiment)
+        first = {schedule.index: schedule.trial_ids() for schedule in experiment.schedules.all()}
+        build_schedules(experiment)
+        second = {schedule.index: schedule.trial_ids() for schedule in experiment.schedules.all()}
+        self.assertEqual(first, second)
+        self.assertEqual(len({tuple(order) for order in first.values()}), len(first))
+
+    def test_runs_walk_latin_square_rows_per_experiment(self):
+        tag, first, pairs = create_fixture(participants=8, trials=4, blocks=2, counterbalance=True, experiments=2)
+        second = Experiment.objects.get(experiment_id=f'{tag}-1')
+        participants = Participant.objects.filter(id__in=[participant_id for participant_id, _ in pairs])
+        # Participants with even ids in one experiment, odd ids in the other
+        for participant in participants:
+            start_run(participant, first if participant.id % 2 == 0 else second)
+
+        for experiment in (first, second):
+            runs = ParticipantRun.objects.filter(experiment=experiment).order_by('id')
+            self.assertEqual([run.schedule.block_sequence for run in runs], ['0,1', '1,0', '0,1', '1,0'])
+
+
+class IngestTests(CacheClearingTestCase):
+    def test_repeated_batch_id_saves_nothing(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=4)
+        participant_id = pairs[0][0]
+        trial_ids = list(Trial.objects.filter(experiment=experiment).order_by('id').values_list('id', flat=True))
+        records = [{'trial_id': trial_id, 'response_key': 'Y', 'response_time': 500.0} for trial_id in trial_ids]
+
+        self.assertEqual(ingest_responses(participant_id, 'batch-1', records, trial_ids), (4, False))
+        self.assertEqual(ingest_responses(participant_id, 'batch-1', records, trial_ids), (0, True))
+        self.assertEqual(Response.objects.filter(participant_id=participant_id).count(), 4)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BatchRunTests(CacheClearingTestCase):
+    def post_batch(self, batch_id, trials):
+        responses = [{'trial_id': trial['id'], 'response_key': 'Y', 'response_time': 500.0} for trial in trials]
+        return self.client.post(
+            reverse('save_responses'), {'batch_id': batch_id, 'responses': responses}, content_type='application/json'
+        )
+
+    def test_rejected_batch_reports_cursor(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=4, batched=True)
+        body = self.client.get(reverse('start_experiment', args=[pairs[0][0], experiment.id])).content.decode()
+        payload = json.loads(PAYLOAD_PATTERN.search(body).group(1))
+        trials = payload['trials']
+        self.assertEqual(payload['cursor'], 0)
+
+        response = self.post_batch('b-1', trials[1:3])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['cursor'], 0)
+        self.assertEqual(self.post_batch('b-2', trials[:2]).json(), {'saved': 2, 'duplicate': False})
+        # Resent after a lost reply, the batch is acknowledged without saving again
+        self.assertEqual(self.post_batch('b-2', trials[:2]).json(), {'saved': 0, 'duplicate': True})
+        self.assertEqual(self.post_batch('b-3', trials[1:3]).json()['cursor'], 2)
+        self.assertEqual(Response.objects.count(), 2)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RunTests(CacheClearingTestCase):
+    def test_resubmitted_form_does_not_skip_a_trial(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=3)
+        participant_id = pairs[0][0]
+        self.client.get(reverse('start_experiment', args=[participant_id, experiment.id]))
+        body = self.client.get(reverse('run_trial')).content.decode()
+        payload = json.loads(PAYLOAD_PATTERN.search(body).group(1))
+        form = {'response_time': '500.0', 'response_key': 'Y', 'cursor': payload['cursor']}
+
+        self.client.post(reverse('save_response'), form)
+        # The browser resends the same form once the answer has been saved
+        self.client.post(reverse('save_response'), form)
+
+        run_id = self.client.session['run_id']
+        self.assertEqual(run_cursor(run_id), 1)
+        self.assertEqual(
+            list(Response.objects.filter(participant_id=participant_id).values_list('trial_id', flat=True)),
+            [payload['trial']['id']]
+        )
+
+    def test_unfinished_run_is_not_completed(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=5)
+        participant_id = pairs[0][0]
+        start = reverse('start_experiment', args=[participant_id, experiment.id])
+        self.client.get(start)
+        self.client.post(reverse('save_response'), {'response_time': '500.0', 'response_key': 'Y'})
+        self.client.get(reverse('experiment_complete'))
+
+        run = ParticipantRun.objects.get(participant_id=participant_id)
+        self.assertIsNone(run.date_completed)
+        self.assertRedirects(self.client.get(start), reverse('run_trial'), fetch_redirect_response=False)
+
+    def test_run_completed_early_is_resumed(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=5)
+        participant_id = pairs[0][0]
+        start = reverse('start_experiment', args=[participant_id, experiment.id])
+        self.client.get(start)
+        ParticipantRun.objects.update(cursor=1, date_completed=timezone.now())
+
+        self.assertRedirects(self.client.get(start), reverse('run_trial'), fetch_redirect_response=False)
+        self.assertEqual(run_cursor(self.client.session['run_id']), 1)
+
+    def test_experiment_without_trials_leaves_other_run_open(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=5)
+        participant_id = pairs[0][0]
+        empty = Experiment.objects.create(experiment_id='empty', name='empty', instructions='')
+        self.client.get(reverse('start_experiment', args=[participant_id, experiment.id]))
+        self.client.get(reverse('start_experiment', args=[participant_id, empty.id]), follow=True)
+
+        self.assertNotIn('run_id', self.client.session)
+        self.assertIsNone(ParticipantRun.objects.get(participant_id=participant_id).date_completed)
+
+
+def add_responses(experiment, participant_ids):
+    """One response by each participant to every trial of experiment."""
+    trials = list(Trial.objects.filter(experiment=experiment).order_by('id'))
+    Response.objects.bulk_create([
+        Response(participant_id=participant_id, trial=trial, experiment=experiment,
+                 response_time=400.0 + i, accuracy=i % 2)
+        for participant_id in participant_ids for i, trial in enumerate(trials)
+    ])
+
+
+class ResponseExportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('researcher'))
+
+    def count_queries(self, participants):
+        _, experiment, pairs = create_fixture(participants=participants, trials=3)
+        add_responses(experiment, [participant_id for participant_id, _ in pairs])
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(response_rows(experiment.pk, chunk_size=5))
+        self.assertEqual(len(rows), participants * 3)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.assertEqual(self.count_queries(2), self.count_queries(20))
+
+    def test_view_streams_live_responses(self):
+        _, experiment, pairs = create_fixture(participants=3, trials=2)
+        add_responses(experiment, [participant_id for participant_id, _ in pairs])
+        Participant.objects.filter(pk=pairs[2][0]).update(deleted_at=timezone.now())
+
+        response = self.client.get(reverse('export_experiment_responses', args=[experiment.id]))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, *rows = csv.reader(b''.join(response.streaming_content).decode().splitlines())
+        self.assertEqual(header, EXPORT_HEADER)
+        self.assertEqual(len(rows), 2 * 2)
+        self.assertEqual({row[0] for row in rows}, {subject_id for _, subject_id in pairs[:2]})
+
+
+class ResultsZipTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        temporary_storages(self, 'results')
+        self.client.force_login(User.objects.create_user('researcher'))
+        self.names = [
+            save_csv('experiment_results_S1_20260101_120000.csv', [('S1', 1, 'word', 1, 'b', 500.0, 1, 'E1')]),
+            save_csv('experiment_results_S2_20260301_120000.csv', [('S2', 2, 'word', 0, 'b', 600.0, 0, 'E2')]),
+        ]
+
+    def download(self, **params):
+        response = self.client.get(reverse('download_responses_csv'), params)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_zip_is_streamed_from_the_results_storage(self):
+        with self.download() as archive:
+            self.assertEqual(archive.namelist(), self.names)
+            with results_storage().open(self.names[0], 'rb') as stored:
+                self.assertEqual(archive.read(self.names[0]), stored.read())
+        with self.download(experiment='E2') as archive:
+            self.assertEqual(archive.namelist(), self.names[1:])
+        with self.download(start='2026-02-01') as archive:
+            self.assertEqual(archive.namelist(), self.names[1:])
+        self.assertEqual(self.client.get(reverse('download_responses_csv'), {'end': 'March'}).status_code, 400)
+
+    def test_unchanged_files_are_not_read_again(self):
+        self.download()
+        with mock.patch.object(exports, 'scan_experiment_ids', wraps=exports.scan_experiment_ids) as scan:
+            self.download()
+            self.assertFalse(scan.called)
+            save_csv('experiment_results_S3_20260401_120000.csv', [('S3', 3, 'word', 1, 'b', 700.0, 1, 'E1')])
+            with self.download(experiment='E1') as archive:
+                self.assertEqual(len(archive.namelist()), 2)
+        self.assertEqual(scan.call_count, 1)
+
+
+class DashboardTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('researcher'))
+
+    def test_counts_cover_both_tiers_and_skip_deleted_participants(self):
+        _, experiment, pairs = create_fixture(participants=3, trials=2)
+        participant_ids = [participant_id for participant_id, _ in pairs]
+        Participation.objects.bulk_create([
+            Participation(participant_id=participant_id, experiment=experiment) for participant_id in participant_ids
+        ])
+        add_responses(experiment, participant_ids[:2])
+        archive_experiment(experiment)
+        add_responses(experiment, participant_ids[2:])
+        Participant.objects.filter(pk=participant_ids[2]).update(deleted_at=timezone.now())
+
+        summary = experiment_summaries().get(pk=experiment.pk)
+        self.assertEqual((summary.trial_count, summary.participant_count, summary.response_count), (2, 2, 4))
+
+    def test_cached_fragments_follow_changes(self):
+        url = reverse('researcher_dashboard')
+        self.client.get(url)
+        Experiment.objects.create(experiment_id='FRESH', name='Fresh experiment')
+        self.assertContains(self.client.get(url), 'Fresh experiment')
+        provision_participants(['S900'])
+        participant = Participant.objects.get(subject_id='S900')
+        edit_url = reverse('edit_participant', args=[participant.pk])
+        self.assertContains(self.client.get(url), edit_url)
+        deletion.schedule_deletion(participant)
+        self.assertNotContains(self.client.get(url), edit_url)
+
+    def test_pages_keep_the_other_sections_pages(self):
+        create_fixture(participants=DASHBOARD_PAGE_SIZE + 5, trials=DASHBOARD_PAGE_SIZE + 1)
+        response = self.client.get(reverse('researcher_dashboard'), {'participants_page': 2, 'trials_page': 2})
+        self.assertEqual(len(response.context['participants']), 5)
+        self.assertEqual(len(response.context['trials']), 1)
+        self.assertEqual(response.context['participants'].previous_query, 'participants_page=1&trials_page=2')
+
+
+class MetadataCacheTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.experiment, self.pairs = create_fixture(participants=1, trials=2, experiments=2)
+        self.other = Experiment.objects.exclude(pk=self.experiment.pk).get()
+
+    def test_reads_are_cached_until_a_save(self):
+        get_experiment(self.experiment.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_experiment(self.experiment.pk).name, self.experiment.name)
+        self.experiment.name = 'Renamed'
+        self.experiment.save()
+        self.assertEqual(get_experiment(self.experiment.pk).name, 'Renamed')
+
+    def test_moved_trial_leaves_both_trial_sets(self):
+        trial = Trial.objects.filter(experiment=self.experiment).first()
+        self.assertIn(trial.id, experiment_trials(self.experiment.pk))
+        self.assertNotIn(trial.id, experiment_trials(self.other.pk))
+
+        trial.experiment = self.other
+        trial.save()
+        self.assertNotIn(trial.id, experiment_trials(self.experiment.pk))
+        self.assertIn(trial.id, experiment_trials(self.other.pk))
+        trial.delete()
+        self.assertNotIn(trial.id, experiment_trials(self.other.pk))
+
+    def test_deleted_participant_is_forgotten(self):
+        participant_id = self.pairs[0][0]
+        participant = participant_or_404(participant_id)
+        deletion.schedule_deletion(participant)
+        with self.assertRaises(Http404):
+            participant_or_404(participant_id)
+
+
+class BrokenContent(ContentFile):
+    """Content whose reading fails after the first chunk, like a dropped upload."""
+
+    def chunks(self, chunk_size=None):
+        yield b'partial'
+        raise OSError('connection lost')
+
+
+class SharedResultsStorageTests(TestCase):
+    def setUp(self):
+        temporary_storages(self, 'results')
+        self.storage = results_storage()
+
+    def stored_names(self):
+        return sorted(os.listdir(self.storage.location))
+
+    def test_files_appear_whole_or_not_at_all(self):
+        self.assertIsInstance(self.storage, AtomicFileSystemStorage)
+        name = self.storage.save('export.csv', ContentFile(b'a,b\n'))
+        self.assertEqual(os.stat(self.storage.path(name)).st_mode & 0o777, 0o644)
+        with self.assertRaises(OSError):
+            self.storage.save('broken.csv', BrokenContent(b''))
+        # Neither the broken file nor its temporary file is left behind
+        self.assertEqual(self.stored_names(), ['export.csv'])
+
+    def test_results_keep_a_free_name_and_a_shared_manifest(self):
+        first = save_csv('experiment_results_S1_20260101_120000.csv', [('S1', 1, 'word', 1, 'b', 500.0, 1, 'E1')])
+        second = save_csv(first, [('S1', 1, 'word', 1, 'b', 500.0, 1, 'E2')])
+        self.assertNotEqual(first, second)
+        with self.storage.open(second, 'rb') as stored:
+            self.assertEqual(list(csv.reader(io.TextIOWrapper(stored, encoding='utf-8')))[1][-1], 'E2')
+
+        manifest = refresh_manifest(self.storage)
+        self.assertEqual({name: entry['experiments'] for name, entry in manifest.items()}, {first: ['E1'], second: ['E2']})
+        self.assertEqual(self.stored_names(), sorted([MANIFEST_FILENAME, first, second]))
+        # Another process that reads the manifest gets the same entries without re-reading the files
+        with mock.patch.object(exports, 'scan_experiment_ids') as scan:
+            self.assertEqual(refresh_manifest(results_storage()), manifest)
+        self.assertFalse(scan.called)
+
+
+class ArchiveTests(CacheClearingTestCase):
+    def test_archived_responses_read_the_same(self):
+        _, experiment, pairs = create_fixture(participants=3, trials=5)
+        trials = list(Trial.objects.filter(experiment=experiment).order_by('id'))
+        Response.objects.bulk_create([
+            Response(participant_id=participant_id, trial=trial, experiment=experiment,
+                     response_time=400.0 + i, accuracy=i % 2)
+            for participant_id, _ in pairs for i, trial in enumerate(trials)
+        ])
+        before = list(response_values(EXPORT_COLUMNS, experiment.pk))
+
+        self.assertEqual(archive_experiment(experiment, chunk_size=4), len(before))
+        self.assertFalse(Response.objects.filter(experiment=experiment).exists())
+        self.assertEqual(list(response_values(EXPORT_COLUMNS, experiment.pk)), before)
+
+
+class AnalyticsTests(CacheClearingTestCase):
+    def test_groups_are_labelled_across_both_tiers(self):
+        _, experiment, pairs = create_fixture(participants=4, trials=4, blocks=2)
+        trials = list(Trial.objects.filter(experiment=experiment).order_by('id'))
+        rows = [
+            (participant_id, subject_id, trial, 300.0 + 10 * p + i, (p + i) % 2)
+            for p, (participant_id, subject_id) in enumerate(pairs) for i, trial in enumerate(trials)
+        ]
+        responses = [
+            Response(participant_id=participant_id, trial=trial, experiment=experiment, response_time=rt, accuracy=accuracy)
+            for participant_id, _, trial, rt, accuracy in rows
+        ]
+        Response.objects.bulk_create(responses[:8])
+        archive_experiment(experiment)
+        Response.objects.bulk_create(responses[8:])
+        # Soft-deleted participants are left out
+        Participant.objects.filter(pk=pairs[3][0]).update(deleted_at=timezone.now())
+        rows = [row for row in rows if row[0] != pairs[3][0]]
+
+        summary = summarize_experiment(experiment)
+        self.assertEqual(summary['n_responses'], len(rows))
+        for field, key in [
+            ('participant', lambda row: row[1]),
+            ('block_name', lambda row: row[2].block_name),
+            ('valence', lambda row: row[2].valence),
+        ]:
+            expected = {}
+            for row in rows:
+                expected.setdefault(key(row), []).append(row)
+            groups = summary['groups'][field]
+            self.assertEqual([group['key'] for group in groups], sorted(expected))
+            for group in groups:
+                members = expected[group['key']]
+                self.assertEqual(group['n'], len(members))
+                self.assertAlmostEqual(group['mean_rt'], sum(row[3] for row in members) / len(members))
+                self.assertAlmostEqual(group['accuracy'], sum(row[4] for row in members) / len(members))
+
+
+class ColumnarExportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        _, self.experiment, self.pairs = create_fixture(participants=2, trials=4)
+        self.trials = list(Trial.objects.filter(experiment=self.experiment).order_by('id'))
+
+    def respond(self, participant_index, trial_index, **fields):
+        return Response.objects.create(
+            participant_id=self.pairs[participant_index][0], trial=self.trials[trial_index],
+            experiment=self.experiment, response_time=500.0, accuracy=1, **fields
+        )
+
+    def test_late_commits_below_the_cursor_are_appended_once(self):
+        first = self.respond(0, 0)
+        self.respond(0, 1, id=first.id + 10)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk, chunk_size=1), 2)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk), 0)
+
+        # A transaction that took a lower id commits after the export ran
+        late = self.respond(1, 0, id=first.id + 5)
+        self.respond(1, 1)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk), 2)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk), 0)
+        exported = read_columnar(self.output_dir)['response_id'].tolist()
+        self.assertEqual(sorted(exported), sorted(Response.objects.values_list('id', flat=True)))
+        self.assertIn(late.id, exported)
+
+        # Rows that show up further back than the window are not looked for
+        self.respond(1, 2, id=first.id + 1)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk, rescan_window=3), 0)
+
+    def test_full_export_starts_over(self):
+        self.respond(0, 0)
+        self.respond(1, 0)
+        export_columnar(self.output_dir, self.experiment.pk)
+        self.assertEqual(export_columnar(self.output_dir, self.experiment.pk, full=True), 2)
+        self.assertEqual(len(read_columnar(self.output_dir)['response_id']), 2)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ExportQueueTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        temporary_storages(self, 'results')
+        _, self.experiment, pairs = create_fixture(participants=2, trials=3)
+        self.participant_id, self.subject_id = pairs[0]
+        self.other_participant_id = pairs[1][0]
+
+    def test_completion_queues_one_export(self):
+        finish_run(self.client, self.participant_id, self.experiment)
+        self.client.get(reverse('experiment_complete'))
+        ExportJob.objects.update(status=ExportJob.DONE)
+        # A refresh of the page once the export is done
+        self.client.get(reverse('experiment_complete'))
+
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_worker_writes_claimed_participants(self):
+        finish_run(self.client, self.participant_id, self.experiment)
+        self.client.get(reverse('experiment_complete'))
+        ExportJob.objects.create(participant_id=self.other_participant_id, experiment=self.experiment)
+
+        jobs = claim_jobs(limit=1)
+        export_experiment_batch(self.experiment.id, jobs)
+
+        job = ExportJob.objects.get(id=jobs[0].id)
+        self.assertEqual(job.status, ExportJob.DONE)
+        with results_storage().open(job.file_name) as f:
+            lines = f.read().decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.startswith(self.subject_id) for line in lines[1:]))
+        self.assertEqual(ExportJob.objects.filter(status=ExportJob.PENDING).count(), 1)
+
+    def test_stale_job_is_requeued(self):
+        job = ExportJob.objects.create(participant_id=self.participant_id, experiment=self.experiment)
+        claimed = claim_jobs()
+        stale_claim = timezone.now() - timedelta(seconds=settings.MAAT_EXPORT_STALE_SECONDS + 1)
+        ExportJob.objects.update(date_claimed=stale_claim)
+
+        self.assertEqual(requeue_stale(), 1)
+        # The abandoned worker finishing late no longer touches the job
+        export_experiment_batch(self.experiment.id, claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.claim, job.file_name), (ExportJob.PENDING, '', ''))
+
+    def test_stale_job_with_pending_twin_fails(self):
+        stale = ExportJob.objects.create(
+            participant_id=self.participant_id, experiment=self.experiment, status=ExportJob.RUNNING
+        )
+        ExportJob.objects.create(participant_id=self.participant_id, experiment=self.experiment)
+
+        requeue_stale()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ExportJob.FAILED)
+        self.assertEqual(ExportJob.objects.filter(status=ExportJob.PENDING).count(), 1)
+
+
+def reload_urls():
+    # The project urlconf holds a resolver for maat_app.urls, so both are reloaded
+    importlib.reload(urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AsyncViewTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        # urls picks the view module on import; cleanups run last in, first out
+        self.addCleanup(reload_urls)
+        override = override_settings(MAAT_ASYNC_VIEWS=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        reload_urls()
+
+    async def test_async_session_completes_run(self):
+        self.assertIs(resolve(reverse('run_trial')).func, async_views.run_trial)
+        _, experiment, pairs = await sync_to_async(create_fixture)(participants=1, trials=3)
+        client = AsyncClient()
+        await client.get(reverse('start_experiment', args=[pairs[0][0], experiment.id]))
+        for cursor in range(3):
+            page = await client.get(reverse('run_trial'))
+            self.assertEqual(json.loads(PAYLOAD_PATTERN.search(page.content.decode()).group(1))['cursor'], cursor)
+            await client.post(reverse('save_response'), {'response_time': '500.0', 'response_key': 'Y', 'cursor': cursor})
+        self.assertRedirects(await client.get(reverse('run_trial')), reverse('experiment_complete'), fetch_redirect_response=False)
+        await client.get(reverse('experiment_complete'))
+        await client.get(reverse('experiment_complete'))
+
+        self.assertEqual(await Response.objects.acount(), 3)
+        self.assertEqual(await ExportJob.objects.acount(), 1)
+        self.assertIsNotNone((await ParticipantRun.objects.aget()).date_completed)
+
+
+@override_settings(MAAT_INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentation._buffer.clear()
+        self.addCleanup(instrumentation._buffer.clear)
+
+    def test_sampled_requests_are_stored_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('participant_login'))
+        self.client.post(reverse('participant_login'), {'participant_id': 'nobody', 'experiment_id': 'none'})
+        self.assertEqual(instrumentation.flush(), 4)
+        self.assertEqual(RequestProfile.objects.get().requests, 4)
+
+        stats = instrumentation.instrumentation_report()['participant_login']
+        self.assertEqual((stats['sampled_requests'], stats['estimated_requests'], stats['errors']), (4, 4, 0))
+        self.assertEqual(sum(stats['histogram'].values()), 4)
+        self.assertGreaterEqual(stats['queries_max'], 1)
+        self.assertLessEqual(stats['p50_ms'], stats['max_ms'])
+
+    def test_report_is_for_staff_over_a_bounded_window(self):
+        url = reverse('request_profile_json')
+        self.client.force_login(User.objects.create_user('researcher'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.client.get(reverse('participant_login'))
+        report = self.client.get(url, {'hours': 'nan'}).json()
+        self.assertEqual(report['hours'], 24)
+        self.assertEqual(report['views']['participant_login']['sampled_requests'], 1)
+        self.assertEqual(self.client.get(url, {'hours': '1e9'}).json()['hours'],
+                         settings.MAAT_INSTRUMENTATION_RETENTION_DAYS * 24)
+
+
+class ResponseConstraintTests(CacheClearingTestCase):
+    def test_second_response_to_a_trial_is_refused(self):
+        _, experiment, pairs = create_fixture(participants=1, trials=1)
+        trial = Trial.objects.get(experiment=experiment)
+        Response.objects.create(participant_id=pairs[0][0], trial=trial, experiment=experiment, response_time=1, accuracy=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Response.objects.create(participant_id=pairs[0][0], trial=trial, experiment=experiment, response_time=2, accuracy=0)
+
+
+class RepeatedResponseMigrationTests(TransactionTestCase):
+    before = [('maat_app', '0014_experiment_schedules_assigned')]
+    after = [('maat_app', '0015_repeated_response')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_repeated_responses_are_set_aside_and_restored(self):
+        self.addCleanup(lambda: self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes()))
+        apps = self.migrate(self.before)
+        experiment = apps.get_model('maat_app', 'Experiment').objects.create(experiment_id='x', name='x')
+        trial = apps.get_model('maat_app', 'Trial').objects.create(
+            experiment=experiment, block_order=1, block_name='b', stimuli='w', valence=1, random_fixation=0, movement=0
+        )
+        user = apps.get_model('auth', 'User').objects.create(username='u')
+        participant = apps.get_model('maat_app', 'Participant').objects.create(user=user, subject_id='u')
+        responses = apps.get_model('maat_app', 'Response').objects.bulk_create([
+            apps.get_model('maat_app', 'Response')(
+                participant=participant, trial=trial, experiment=experiment, response_time=100 + i, accuracy=1
+            )
+            for i in range(3)
+        ])
+        first_id = min(response.id for response in responses)
+
+        apps = self.migrate(self.after)
+        kept = apps.get_model('maat_app', 'Response').objects.values_list('id', flat=True)
+        repeated = apps.get_model('maat_app', 'RepeatedResponse').objects.values_list('response_time', flat=True)
+        self.assertEqual(list(kept), [first_id])
+        self.assertEqual(sorted(repeated), [101, 102])
+
+        apps = self.migrate(self.before)
+        self.assertEqual(apps.get_model('maat_app', 'Response').objects.count(), 3)
+
+
+class BenchmarkQueriesTests(TransactionTestCase):
+    def response_indexes(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Response._meta.db_table))
+
+    def test_indexes_are_restored_and_fixture_removed(self):
+        indexes = self.response_indexes()
+        out = io.StringIO()
+        call_command('benchmark_queries', participants=2, trials=4, experiments=1, repeat=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['responses'], 8)
+        self.assertEqual(set(report['queries']['participant_export']), {'without_indexes', 'with_indexes'})
+        self.assertEqual(self.response_indexes(), indexes)
+        self.assertFalse(Experiment.all_objects.exists())
+
+    def test_failed_run_still_cleans_up(self):
+        indexes = self.response_indexes()
+        with mock.patch.object(benchmark_queries.Command, 'time_queries', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            call_command('benchmark_queries', participants=2, trials=4, experiments=1, repeat=1, stdout=io.StringIO())
+
+        self.assertEqual(self.response_indexes(), indexes)
+        self.assertFalse(Experiment.all_objects.exists())
+
+
+class BenchmarkSessionsTests(TransactionTestCase):
+    def benchmark(self, **options):
+        out = io.StringIO()
+        # One session at a time: the in-memory test database locks tables across threads
+        call_command('benchmark_sessions', participants='2', concurrency=1, trials=3, stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def test_sessions_run_to_completion(self):
+        for mode in ('wsgi', 'asgi'):
+            with self.subTest(mode=mode):
+                report = self.benchmark(mode=mode)
+                self.assertEqual(report['errors'], 0)
+                self.assertEqual(report['participants'], 2)
+                self.assertIn('save_response', report['views'])
+                self.assertIn('queries_max', report['views']['save_response'])
+                self.assertFalse(Experiment.all_objects.exists())
+                self.assertFalse(User.objects.exists())
+
+    def test_regressions_against_a_baseline(self):
+        report = {'errors': 0, 'views': {'run_trial': {'p95_ms': 10.0, 'queries_max': 4}}}
+        self.assertEqual(find_regressions(report, report, 0.25), [])
+        baseline = {'views': {'run_trial': {'p95_ms': 5.0, 'queries_max': 3}}}
+        self.assertEqual(find_regressions(report, baseline, 0.25), [
+            'run_trial: p95 5.0 -> 10.0 ms', 'run_trial: queries per request 3 -> 4'
+        ])
+
+        baseline_file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        self.addCleanup(os.remove, baseline_file.name)
+        with baseline_file:
+            json.dump({'views': {'save_response': {'p95_ms': 0.0, 'queries_max': 0}}}, baseline_file)
+        with self.assertRaises(CommandError):
+            self.benchmark(mode='wsgi', baseline=baseline_file.name, output=os.devnull)
+        self.assertFalse(Experiment.all_objects.exists())
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile')
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in ('synchronous', 'busy_timeout')
+            }
+        # 1 is NORMAL
+        self.assertEqual(pragmas, {'synchronous': 1, 'busy_timeout': settings.MAAT_SQLITE_PRAGMAS['busy_timeout']})
+
+
+class LoadtestWritesTests(TransactionTestCase):
+    def test_writes_are_counted_and_fixture_removed(self):
+        out = io.StringIO()
+        call_command('loadtest_writes', participants=2, trials=3, stdout=out)
+
+        report = json.loads(out.getvalue())
+        # One response per write; a write that met a locked database is counted instead
+        self.assertEqual(report['responses_written'] + report['locked_errors'], 6)
+        self.assertFalse(Experiment.all_objects.exists())
+        self.assertFalse(Participant.objects.exists())
+
+    def test_failed_run_still_cleans_up(self):
+        with mock.patch.object(loadtest_writes.Command, 'measure', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            call_command('loadtest_writes', participants=2, trials=3, stdout=io.StringIO())
+
+        self.assertFalse(Experiment.all_objects.exists())
+        self.assertFalse(Participant.objects.exists())
+
+
+TRIAL_CSV = '''block_order,block_name,stimuli,valence,random_fixation,movement
+1,practice,happy,1,0,0
+1,practice,sad,0,0,1
+2,main,calm,1,0,0
+'''
+
+
+class TrialImportTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.experiment, self.pairs = create_fixture(participants=1, trials=2)
+
+    def test_csv_rows_are_created(self):
+        report = import_trials(io.StringIO(TRIAL_CSV), experiment=self.experiment)
+        self.assertEqual((report.created, report.errors), (3, []))
+        self.assertEqual(Trial.objects.filter(experiment=self.experiment).count(), 5)
+
+    def test_invalid_row_rolls_back_unless_skipped(self):
+        rows = TRIAL_CSV + '2,main,,x,0,0\n'
+        report = import_trials(io.StringIO(rows), experiment=self.experiment)
+        self.assertEqual(report.created, 0)
+        self.assertEqual([line for line, _ in report.errors], [5, 5])
+        self.assertEqual(Trial.objects.filter(experiment=self.experiment).count(), 2)
+
+        report = import_trials(io.StringIO(rows), experiment=self.experiment, skip_invalid=True)
+        self.assertEqual(report.created, 3)
+
+    def test_jsonl_rows_name_their_experiment(self):
+        rows = [
+            {'experiment': self.experiment.experiment_id, 'block_order': 1, 'block_name': 'a', 'stimuli': 'joy',
+             'valence': 1, 'random_fixation': 0, 'movement': 0},
+            {'experiment': 42, 'block_order': 1, 'block_name': 'a', 'stimuli': 'joy', 'valence': 1,
+             'random_fixation': 0, 'movement': 0},
+        ]
+        report = import_trials(io.StringIO('\n'.join(json.dumps(row) for row in rows)), fmt='jsonl', skip_invalid=True)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors, [(2, "experiment: unknown experiment '42'")])
+
+    def test_replace_deletes_trials_without_per_trial_signals(self):
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance)
+        post_delete.connect(receiver, sender=Trial)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Trial)
+
+        report = import_trials(io.StringIO(TRIAL_CSV), experiment=self.experiment, replace=True)
+        self.assertEqual((report.replaced, report.created), (2, 3))
+        self.assertEqual(deleted, [])
+        self.assertEqual(
+            sorted(Trial.objects.filter(experiment=self.experiment).values_list('stimuli', flat=True)),
+            ['calm', 'happy', 'sad']
+        )
+
+    def test_replace_is_refused_with_responses_or_runs_in_progress(self):
+        trial = Trial.objects.filter(experiment=self.experiment).first()
+        participant = Participant.objects.get(id=self.pairs[0][0])
+        start_run(participant, self.experiment)
+        report = import_trials(io.StringIO(TRIAL_CSV), experiment=self.experiment, replace=True)
+        self.assertIn('running the experiment', report.errors[0][1])
+
+        ParticipantRun.objects.update(date_completed=timezone.now())
+        Response.objects.create(participant=participant, trial=trial, experiment=self.experiment,
+                                response_time=500.0, accuracy=1)
+        report = import_trials(io.StringIO(TRIAL_CSV), experiment=self.experiment, replace=True)
+        self.assertIn('already have responses', report.errors[0][1])
+        self.assertEqual(Trial.objects.filter(experiment=self.experiment).count(), 2)
+
+
+PNG_BYTES = bytes.fromhex('89504e470d0a1a0a') + b'stimulus'
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class TrialPageRenderingTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        rendering._shells.clear()
+        self.addCleanup(rendering._shells.clear)
+        _, self.experiment, pairs = create_fixture(participants=1, trials=3)
+        self.client.get(reverse('start_experiment', args=[pairs[0][0], self.experiment.id]))
+
+    def test_shell_is_rendered_once_and_filled_per_request(self):
+        with mock.patch.object(rendering, 'render_shell', wraps=rendering.render_shell) as render_shell:
+            first = self.client.get(reverse('run_trial'))
+            self.client.post(reverse('save_response'), {'response_time': '500.0', 'response_key': 'Y'})
+            second = self.client.get(reverse('run_trial'))
+        self.assertEqual(render_shell.call_count, 1)
+
+        page = second.content.decode()
+        payload = json.loads(PAYLOAD_PATTERN.search(page).group(1))
+        self.assertNotEqual(payload, json.loads(PAYLOAD_PATTERN.search(first.content.decode()).group(1)))
+        # The same page the template renders with the request's (masked) token
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+        self.assertEqual(page, render_to_string('experiment.html', {'csrf_token': token, 'payload': payload}))
+
+    def test_only_text_responses_are_compressed(self):
+        response = self.client.get(reverse('run_trial'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'trial-payload', gzip.decompress(response.content))
+
+        temporary_storages(self, 'stimulus_assets')
+        asset, _ = store_asset(SimpleUploadedFile('face.png', PNG_BYTES * 100))
+        image = self.client.get(reverse('stimulus_asset', args=[f'{asset.sha256}.png']), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class StimulusAssetTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        temporary_storages(self, 'stimulus_assets')
+
+    def test_same_content_is_stored_once(self):
+        asset, created = store_asset(SimpleUploadedFile('face.png', PNG_BYTES))
+        again, created_again = store_asset(SimpleUploadedFile('copy.PNG', PNG_BYTES))
+        self.assertEqual((created, created_again, again.pk), (True, False, asset.pk))
+        with self.assertRaises(ValidationError):
+            store_asset(SimpleUploadedFile('drawing.svg', b'<svg/>'))
+
+    def test_asset_is_served_for_good(self):
+        asset, _ = store_asset(SimpleUploadedFile('face.png', PNG_BYTES))
+        url = reverse('stimulus_asset', args=[f'{asset.sha256}.png'])
+
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), PNG_BYTES)
+        self.assertEqual((response['Content-Type'], response['Cache-Control']), ('image/png', ASSET_CACHE_CONTROL))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('stimulus_asset', args=['0' * 64 + '.png'])).status_code, 404)
+
+    def test_first_trial_page_preloads_the_run(self):
+        asset, _ = store_asset(SimpleUploadedFile('face.png', PNG_BYTES))
+        _, experiment, pairs = create_fixture(participants=1, trials=3)
+        Trial.objects.filter(experiment=experiment).update(asset=asset, random_fixation=1)
+        self.client.get(reverse('start_experiment', args=[pairs[0][0], experiment.id]))
+
+        body = self.client.get(reverse('run_trial')).content.decode()
+        payload = json.loads(PAYLOAD_PATTERN.search(body).group(1))
+        self.assertEqual(payload['trial']['asset']['kind'], 'image')
+        self.assertEqual(payload['trial']['random_fixation'], 1)
+        self.assertEqual([asset['url'] for asset in payload['preload']], [payload['trial']['asset']['url']])
+
+
+@override_settings(MAAT_DELETION_PAUSE_SECONDS=0)
+class DeletionWorkerTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.experiment, self.pairs = create_fixture(participants=2, trials=3)
+        trials = Trial.objects.filter(experiment=self.experiment)
+        Response.objects.bulk_create([
+            Response(participant_id=participant_id, trial=trial, experiment=self.experiment, response_time=500.0, accuracy=1)
+            for participant_id, _ in self.pairs for trial in trials
+        ])
+
+    def test_participant_is_purged_in_batches(self):
+        participant = Participant.objects.get(pk=self.pairs[0][0])
+        job = deletion.schedule_deletion(participant)
+        self.assertIsNone(deletion.schedule_deletion(participant))
+        self.assertFalse(Participant.objects.filter(pk=participant.pk).exists())
+
+        self.assertEqual(deletion.process_pending(batch_size=2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_deleted, job.rows_total), (DeletionJob.DONE, 4, 4))
+        self.assertFalse(Participant.all_objects.filter(pk=participant.pk).exists())
+        self.assertEqual(Response.objects.filter(experiment=self.experiment).count(), 3)
+
+    def test_experiment_is_purged(self):
+        deletion.schedule_deletion(self.experiment)
+        deletion.process_pending()
+        self.assertFalse(Experiment.all_objects.filter(pk=self.experiment.pk).exists())
+        self.assertFalse(Trial.objects.filter(experiment_id=self.experiment.pk).exists())
+        self.assertFalse(Response.objects.exists())
+
+    def test_stale_job_is_requeued_and_its_worker_cut_off(self):
+        job = deletion.schedule_deletion(Participant.objects.get(pk=self.pairs[0][0]))
+        [claimed] = deletion.claim_jobs()
+        self.assertEqual(deletion.claim_jobs(), [])
+        DeletionJob.objects.filter(pk=job.pk).update(
+            rows_deleted=2, heartbeat=timezone.now() - timedelta(seconds=settings.MAAT_DELETION_STALE_SECONDS + 1)
+        )
+        self.assertEqual(deletion.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.claim, job.rows_deleted), (DeletionJob.PENDING, '', 0))
+
+        # The first worker finishing late records nothing on the requeued job
+        deletion.purge(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.PENDING)
+        self.assertEqual(deletion.process_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+
+
+class ProvisioningTests(CacheClearingTestCase):
+    def test_invalid_usernames_create_nothing(self):
+        with self.assertRaises(ValidationError) as raised:
+            provision_participants(['S001', 'S 002', 'S/003'])
+        self.assertIn('S 002, S/003', str(raised.exception))
+        self.assertFalse(User.objects.exists())
+
+    def test_deleted_subject_id_can_be_provisioned_again(self):
+        experiment = Experiment.objects.create(experiment_id='E1', name='E1', num_trials=0)
+        provision_participants(['S001', 'S002'], experiment)
+        self.assertEqual(Participant.objects.get(subject_id='S001').experiments.get(), experiment)
+        with self.assertRaises(ValidationError):
+            provision_participants(['S001'])
+
+        participant = Participant.objects.get(subject_id='S001')
+        deletion.schedule_deletion(participant)
+        self.assertFalse(User.objects.get(pk=participant.user_id).is_active)
+        provision_participants(['S001'])
+        deletion.process_pending()
+
+        self.assertFalse(User.objects.filter(pk=participant.user_id).exists())
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['S001', 'S002'])
+        self.assertEqual(Participant.objects.get(subject_id='S001').user.username, 'S001')
@@ -0,0 +1,172 @@
+import csv
+import json
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .dashboard import bump_dashboard_version
+from .deletion import delete_batch
+from .metadata import forget_trials
+from .models import (
+    Experiment, ParticipantRun, RepeatedResponse, Response as ParticipantResponse, ResponseArchive, StimulusAsset, Trial
+)
+from .schedules import invalidate_schedules
+
+TRIAL_FIELDS = ['block_order', 'block_name', 'stimuli', 'valence', 'random_fixation', 'movement']
+IMPORT_CHUNK_SIZE = 1000
+
+
+class TrialImportReport:
+    def __init__(self):
+        self.created = 0
+        self.replaced = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class AbortImport(Exception):
+    pass
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def iter_records(stream, fmt):
+    """Yield (line number, dict) pairs from a text stream without reading it all in."""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, record if isinstance(record, dict) else ValueError('Expected a JSON object')
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def text_value(value):
+    # JSONL rows may carry numbers (or anything else) where CSV has text
+    return '' if value is None else str(value).strip()
+
+
+def clean_trial(record, experiment_pk, asset_pks=None):
+    """
+    Validate a record against the Trial model fields; returns (Trial, errors).
+    An optional ``asset`` column names an uploaded stimulus asset by its SHA-256.
+    """
+    values = {}
+    errors = []
+    for name in TRIAL_FIELDS:
+        field = Trial._meta.get_field(name)
+        value = record.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    sha256 = text_value(record.get('asset')).lower()
+    if sha256:
+        values['asset_id'] = (asset_pks or {}).get(sha256)
+        if values['asset_id'] is None:
+            errors.append(f"asset: no uploaded stimulus asset with SHA-256 '{sha256}'")
+    if errors:
+        return None, errors
+    return Trial(experiment_id=experiment_pk, **values), []
+
+
+def replace_refusal(experiment_pk):
+    """Why the experiment's trials cannot be replaced, or None."""
+    if (ParticipantResponse.objects.filter(experiment_id=experiment_pk).exists()
+            or RepeatedResponse.objects.filter(experiment_id=experiment_pk).exists()
+            or ResponseArchive.objects.filter(experiment_id=experiment_pk).exists()):
+        return 'cannot replace trials that already have responses'
+    if ParticipantRun.objects.filter(experiment_id=experiment_pk, date_completed__isnull=True).exists():
+        return 'cannot replace trials while participants are running the experiment'
+    return None
+
+
+def import_trials(stream, fmt='csv', experiment=None, replace=False, skip_invalid=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Stream-parse trials from a CSV or JSONL text stream and insert them in
+    bulk_create chunks, all inside one transaction.
+
+    Rows go to ``experiment`` if given, otherwise to the experiment named by
+    each row's ``experiment`` column (an Experiment.experiment_id). With
+    ``replace`` the existing trials of every target experiment are deleted
+    first, unless it has responses or runs in progress. Unless ``skip_invalid`` is set, any invalid row rolls the whole
+    import back; either way every problem is listed in the returned report.
+    """
+    report = TrialImportReport()
+    experiment_pks = dict(Experiment.objects.values_list('experiment_id', 'id'))
+    asset_pks = dict(StimulusAsset.objects.values_list('sha256', 'id'))
+    replaced_experiments = set()
+    refusals = {}
+    touched_experiments = set()
+    pending = []
+
+    try:
+        with transaction.atomic():
+            for line_number, record in iter_records(stream, fmt):
+                if isinstance(record, Exception):
+                    report.add_error(line_number, str(record))
+                    continue
+                if experiment is not None:
+                    experiment_pk = experiment.pk
+                else:
+                    experiment_pk = experiment_pks.get(text_value(record.get('experiment')))
+                    if experiment_pk is None:
+                        report.add_error(line_number, f"experiment: unknown experiment '{record.get('experiment')}'")
+                        continue
+
+                trial, errors = clean_trial(record, experiment_pk, asset_pks)
+                for message in errors:
+                    report.add_error(line_number, message)
+                if trial is None or (report.errors and not skip_invalid):
+                    continue
+
+                if replace and experiment_pk not in replaced_experiments:
+                    if experiment_pk not in refusals:
+                        refusals[experiment_pk] = replace_refusal(experiment_pk)
+                    if refusals[experiment_pk]:
+                        report.add_error(line_number, f'experiment: {refusals[experiment_pk]}')
+                        continue
+                    # Raw DELETEs skip the per-trial post_delete signals; the
+                    # caches are invalidated once per experiment below
+                    trials = Trial.objects.filter(experiment_id=experiment_pk)
+                    while ids := delete_batch(trials, chunk_size):
+                        report.replaced += len(ids)
+                    replaced_experiments.add(experiment_pk)
+
+                pending.append(trial)
+                touched_experiments.add(experiment_pk)
+                if len(pending) >= chunk_size:
+                    Trial.objects.bulk_create(pending)
+                    report.created += len(pending)
+                    pending = []
+
+            if report.errors and not skip_invalid:
+                raise AbortImport
+            if pending:
+                Trial.objects.bulk_create(pending)
+                report.created += len(pending)
+    except AbortImport:
+        report.created = 0
+        report.replaced = 0
+
+    if report.created or report.replaced:
+        for experiment_pk in touched_experiments:
+            invalidate_schedules(experiment_pk)
+            forget_trials(experiment_pk)
+        bump_dashboard_version()
+    return report
@@ -1,30 +1,48 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views, views
 from .views import (
-    home, participant_login, show_instructions, start_experiment, run_trial, save_response, experiment_complete,
-    list_experiments, configure_experiment, create_experiment, edit_experiment, delete_experiment, download_responses_csv,
-    register_participant, edit_participant, delete_participant,
-    create_trial, edit_trial, delete_trial, researcher_dashboard
+    home, show_instructions, start_experiment, save_responses,
+    list_experiments, configure_experiment, create_experiment, edit_experiment, delete_experiment, complete_experiment,
+    download_responses_csv,
+    export_experiment_responses, experiment_analytics, experiment_analytics_json, request_profile, request_profile_json,
+    register_participant, provision_participants_view, edit_participant, delete_participant,
+    create_trial, import_trials_view, stimulus_assets, stimulus_asset, edit_trial, delete_trial, researcher_dashboard
 )
 
+# The participant hot path is served by the async views under ASGI
+participant_views = async_views if settings.MAAT_ASYNC_VIEWS else views
+
 urlpatterns = [
     path('', home, name='home'),
-    path('participant-login/', participant_login, name='participant_login'),
+    path('participant-login/', participant_views.participant_login, name='participant_login'),
     path('experiments/', list_experiments, name='list_experiments'),
     path('experiments/configure/<int:experiment_id>/', configure_experiment, name='configure_experiment'),
     path('experiments/create/', create_experiment, name='create_experiment'),
     path('experiments/edit/<int:experiment_id>/', edit_experiment, name='edit_experiment'),
     path('experiments/delete/<int:experiment_id>/', delete_experiment, name='delete_experiment'),
+    path('experiments/complete/<int:experiment_id>/', complete_experiment, name='complete_experiment'),
     path('instructions/<int:participant_id>/<str:experiment_id>/', show_instructions, name='show_instructions'),
     path('start-experiment/<int:participant_id>/<str:experiment_id>/', start_experiment, name='start_experiment'),
-    path('run-trial/', run_trial, name='run_trial'),
-    path('save-response/', save_response, name='save_response'),
-    path('experiment-complete/', experiment_complete, name='experiment_complete'),
+    path('run-trial/', participant_views.run_trial, name='run_trial'),
+    path('save-response/', participant_views.save_response, name='save_response'),
+    path('save-responses/', save_responses, name='save_responses'),
+    path('experiment-complete/', participant_views.experiment_complete, name='experiment_complete'),
+    path('experiments/export/<int:experiment_id>/', export_experiment_responses, name='export_experiment_responses'),
+    path('experiments/analytics/<int:experiment_id>/', experiment_analytics, name='experiment_analytics'),
+    path('experiments/analytics/<int:experiment_id>/json/', experiment_analytics_json, name='experiment_analytics_json'),
     path('download-responses/', download_responses_csv, name='download_responses_csv'),
     path('register-participant/', register_participant, name='register_participant'),
+    path('provision-participants/', provision_participants_view, name='provision_participants'),
     path('edit-participant/<int:participant_id>/', edit_participant, name='edit_participant'),
     path('delete-participant/<int:participant_id>/', delete_participant, name='delete_participant'),
     path('create-trial/', create_trial, name='create_trial'),
+    path('import-trials/', import_trials_view, name='import_trials'),
+    path('stimulus-assets/', stimulus_assets, name='stimulus_assets'),
+    path('assets/<str:file_name>', stimulus_asset, name='stimulus_asset'),
     path('edit-trial/<int:trial_id>/', edit_trial, name='edit_trial'),
     path('delete-trial/<int:trial_id>/', delete_trial, name='delete_trial'),
     path('researcher-dashboard/', researcher_dashboard, name='researcher_dashboard'),
+    path('request-profile/', request_profile, name='request_profile'),
+    path('request-profile/json/', request_profile_json, name='request_profile_json'),
 ]
\ No newline at end of file
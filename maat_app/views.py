@@ -1,15 +1,37 @@
-import csv
-import os
-import zipfile
-from datetime import datetime
+import io
+import json
+import math
+from datetime import timedelta
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.static import serve
 from django.contrib.auth.decorators import login_required
-from .models import Experiment, Trial, Participant, Response as ParticipantResponse
-from .forms import ExperimentForm, RegisterParticipantForm, TrialForm
-import random
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db.models import Count
+from .models import DeletionJob, Experiment, ExportJob, ResponseArchive, StimulusAsset, Trial, Participant
+from .forms import ExperimentForm, ProvisionParticipantsForm, RegisterParticipantForm, StimulusAssetForm, TrialForm, TrialImportForm
+from .exports import (
+    csv_lines, response_rows, results_storage, refresh_manifest, select_result_files, zip_stream
+)
+from .analytics import summarize_experiment
+from .assets import ASSET_CACHE_CONTROL, open_asset, run_trial_payload, store_asset, trial_payload
+from .instrumentation import flush, instrumentation_report
+from .dashboard import DASHBOARD_CACHE_TIMEOUT, bump_dashboard_version, dashboard_version, experiment_summaries, paginate
+from .deletion import schedule_deletion
+from .rendering import render_trial_page
+from .provisioning import credential_lines, credential_rows, provision_participants
+from .export_queue import enqueue_export
+from .runs import complete_run, record_response, record_responses, run_cursor, run_state, start_run
+from .ingest import InvalidBatch
+from .metadata import experiment_or_404, experiment_trials, forget_experiment, participant_or_404, trial_or_404
+from .trial_import import detect_format, import_trials
 
 # Home View
 def home(request):
@@ -23,6 +45,8 @@ def participant_login(request):
         try:
             participant = Participant.objects.get(subject_id=participant_id)
             experiment = Experiment.objects.get(experiment_id=experiment_id)
+            if experiment.completed_at is not None:
+                return render(request, 'participant_login.html', {'error': 'This experiment has ended'})
             return redirect('show_instructions', participant_id=participant.id, experiment_id=experiment.id)
         except Participant.DoesNotExist:
             return render(request, 'participant_login.html', {'error': 'Invalid Participant ID'})
@@ -32,106 +56,112 @@ def participant_login(request):
 
 # Instruction View
 def show_instructions(request, participant_id, experiment_id):
-    participant = get_object_or_404(Participant, id=participant_id)
-    experiment = get_object_or_404(Experiment, id=experiment_id)
+    participant = participant_or_404(participant_id)
+    experiment = experiment_or_404(experiment_id)
     if request.method == 'POST':
         return redirect('start_experiment', participant_id=participant_id, experiment_id=experiment_id)
     return render(request, 'instructions.html', {'participant': participant, 'instructions': experiment.instructions})
 
 # Experiment Start View
 def start_experiment(request, participant_id, experiment_id):
-    participant = get_object_or_404(Participant, id=participant_id)
-    experiment = get_object_or_404(Experiment, id=experiment_id)
-    trials = list(Trial.objects.filter(experiment=experiment))
-    
-    if not trials:
-        return redirect('experiment_complete')
+    participant = participant_or_404(participant_id)
+    experiment = experiment_or_404(experiment_id)
+    run = start_run(participant, experiment)
+    if run is None:
+        # Already completed or without trials; shown without queueing an export, and
+        # a run of another experiment left in the session must not be completed
+        request.session.pop('run_id', None)
+        return render(request, 'experiment_complete.html')
+    request.session['run_id'] = run.id
+    if experiment.batched_run:
+        return run_batch(request, run)
+    return redirect('run_trial')
 
-    random.shuffle(trials)
-    request.session['participant_id'] = participant.id
-    request.session['experiment_id'] = experiment.id
-    request.session['trials'] = [trial.id for trial in trials]
-    request.session['current_trial_index'] = 0
-    request.session['experiment_params'] = {
-        'text_size': experiment.text_size,
-        'text_increase_size': experiment.text_increase_size,
-        'text_decrease_size': experiment.text_decrease_size,
+# Batched Run View - the remaining shuffled sequence is sent once and run client-side
+def run_batch(request, run):
+    state = run_state(run.id)
+    trials = experiment_trials(state['experiment_id'])
+    payload = {
+        'trials': [
+            trial_payload(trial_or_404(trials, trial_id)) for trial_id in state['trial_ids'][run.cursor:]
+        ],
+        'cursor': run.cursor,
+        'params': state['params'],
+        'batch_size': settings.MAAT_RESPONSE_BATCH_SIZE,
     }
-    return redirect('run_trial')
+    return render_trial_page(request, 'experiment_batch.html', payload)
 
 # Display Trial View
 def run_trial(request):
-    if 'current_trial_index' not in request.session:
+    run_id = request.session.get('run_id')
+    state = run_state(run_id) if run_id else None
+    if state is None:
         return redirect('participant_login')
     
-    current_trial_index = request.session['current_trial_index']
-    trial_ids = request.session['trials']
+    current_trial_index = run_cursor(run_id)
+    trial_ids = state['trial_ids']
     
     if current_trial_index >= len(trial_ids):
         return redirect('experiment_complete')
     
-    trial = get_object_or_404(Trial, id=trial_ids[current_trial_index])
-    params = request.session['experiment_params']
-    return render(request, 'experiment.html', {'stimulus': trial.stimuli, 'trial_id': trial.id, 'params': params})
+    trials = experiment_trials(state['experiment_id'])
+    trial_or_404(trials, trial_ids[current_trial_index])
+    return render_trial_page(request, 'experiment.html', run_trial_payload(state, trials, current_trial_index))
 
 # Capture Response View
 @csrf_exempt
 def save_response(request):
     if request.method == 'POST':
-        participant = get_object_or_404(Participant, id=request.session['participant_id'])
-        current_trial_index = request.session['current_trial_index']
-        trial_ids = request.session['trials']
-        trial = get_object_or_404(Trial, id=trial_ids[current_trial_index])
+        run_id = request.session.get('run_id')
+        state = run_state(run_id) if run_id else None
+        if state is None:
+            return redirect('participant_login')
+        current_trial_index = run_cursor(run_id)
+        trial_ids = state['trial_ids']
+        if current_trial_index >= len(trial_ids):
+            return redirect('experiment_complete')
+        # The form names the trial it answers; a resubmitted answer to an earlier one is dropped
+        if request.POST.get('cursor', str(current_trial_index)) != str(current_trial_index):
+            return redirect('run_trial')
+        trial = trial_or_404(experiment_trials(state['experiment_id']), trial_ids[current_trial_index])
         
         response_time = float(request.POST['response_time'])
         response_key = request.POST['response_key']
         
-        correct_response = 'Y' if trial.valence == 1 else 'N'
-        accuracy = 1 if response_key == correct_response else 0
-
-        ParticipantResponse.objects.create(
-            participant=participant,
-            trial=trial,
-            response_time=response_time,
-            accuracy=accuracy
-        )
-        
-        request.session['current_trial_index'] += 1
+        record_response(run_id, current_trial_index, state['participant_id'], trial, response_time, response_key)
         return redirect('run_trial')
 
-# Experiment Completion View - Save results to CSV
+# Capture Response Batch View - bulk POST from the batched run page
+def save_responses(request):
+    run_id = request.session.get('run_id')
+    state = run_state(run_id) if run_id else None
+    if request.method != 'POST' or state is None:
+        return JsonResponse({'error': 'No experiment in progress'}, status=400)
+    # A rejected batch is answered with the run's cursor, so the page can resend what is still missing
+    try:
+        body = json.loads(request.body)
+        saved, duplicate = record_responses(
+            run_id,
+            run_cursor(run_id),
+            state,
+            body['batch_id'],
+            body['responses'],
+            experiment_trials(state['experiment_id'])
+        )
+    except InvalidBatch as e:
+        return JsonResponse({'error': str(e), 'cursor': run_cursor(run_id)}, status=400)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Malformed response batch', 'cursor': run_cursor(run_id)}, status=400)
+
+    return JsonResponse({'saved': saved, 'duplicate': duplicate})
+
+# Experiment Completion View - queue the results export for the background worker
 def experiment_complete(request):
-    participant_id = request.session['participant_id']
-    participant = get_object_or_404(Participant, id=participant_id)
-    
-    # Create directory if not exists
-    results_dir = os.path.join(settings.BASE_DIR, 'experiment_results')
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir)
-    
-    # Generate unique filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'experiment_results_{participant.subject_id}_{timestamp}.csv'
-    file_path = os.path.join(results_dir, filename)
-
-    # Save responses to CSV file
-    with open(file_path, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['Participant ID', 'Trial ID', 'Stimuli', 'Valence', 'Block Name', 'Response Time (ms)', 'Accuracy (1=Correct, 0=Incorrect)', 'Experiment ID'])
-        
-        responses = ParticipantResponse.objects.filter(participant=participant)
-        for response in responses:
-            writer.writerow([
-                response.participant.subject_id,
-                response.trial.id,
-                response.trial.stimuli,
-                response.trial.valence,
-                response.trial.block_name,
-                response.response_time,
-                response.accuracy,
-                response.trial.experiment.experiment_id
-            ])
-    
+    run_id = request.session.get('run_id')
+    state = run_state(run_id) if run_id else None
+    # Only the request that completes the run queues its export, not a refresh of the page
+    if state is not None and complete_run(run_id):
+        enqueue_export(state['participant_id'], state['experiment_id'])
     return render(request, 'experiment_complete.html')
 
 # List of Experiments View
@@ -183,20 +213,49 @@ def edit_experiment(request, experiment_id):
 def delete_experiment(request, experiment_id):
     experiment = get_object_or_404(Experiment, id=experiment_id)
     if request.method == 'POST':
-        experiment.delete()
+        schedule_deletion(experiment)
         return redirect('list_experiments')
     return render(request, 'delete_experiment.html', {'experiment': experiment})
 
+# Complete Experiment View - closes it to new participants so its responses can be archived
+@login_required
+def complete_experiment(request, experiment_id):
+    experiment = get_object_or_404(Experiment, id=experiment_id)
+    if request.method == 'POST':
+        Experiment.objects.filter(id=experiment.id, completed_at__isnull=True).update(completed_at=timezone.now())
+        forget_experiment(experiment.id)
+        bump_dashboard_version()
+        return redirect('researcher_dashboard')
+    return render(request, 'complete_experiment.html', {'experiment': experiment})
+
 # Researcher Dashboard View
 @login_required
 def researcher_dashboard(request):
-    experiments = Experiment.objects.all()
-    participants = Participant.objects.all()
-    trials = Trial.objects.all()
+    experiments = paginate(request, experiment_summaries(), 'experiments_page')
+    participants = paginate(request, Participant.objects.only('id', 'subject_id').order_by('id'), 'participants_page')
+    trials = paginate(
+        request,
+        Trial.objects.filter(experiment__deleted_at__isnull=True).select_related('experiment').only(
+            'id', 'stimuli', 'experiment__name'
+        ).order_by('id'),
+        'trials_page'
+    )
+    export_counts = dict(ExportJob.objects.values_list('status').annotate(count=Count('id')))
+    export_jobs = ExportJob.objects.filter(
+        participant__deleted_at__isnull=True, experiment__deleted_at__isnull=True
+    ).select_related('participant', 'experiment').order_by('-id')[:20]
+    deletion_jobs = DeletionJob.objects.exclude(
+        status=DeletionJob.DONE, date_finished__lt=timezone.now() - timedelta(days=1)
+    ).order_by('-id')[:20]
     return render(request, 'researcher_dashboard.html', {
         'experiments': experiments,
         'participants': participants,
         'trials': trials,
+        'dashboard_version': dashboard_version(),
+        'cache_timeout': DASHBOARD_CACHE_TIMEOUT,
+        'export_counts': [(label, export_counts.get(status, 0)) for status, label in ExportJob.STATUS_CHOICES],
+        'export_jobs': export_jobs,
+        'deletion_jobs': deletion_jobs,
     })
 
 # Register Participant View
@@ -211,6 +270,27 @@ def register_participant(request):
         form = RegisterParticipantForm()
     return render(request, 'register_participant.html', {'form': form})
 
+# Bulk Participant Provisioning View - streams back a CSV of login details
+@login_required
+def provision_participants_view(request):
+    if request.method == 'POST':
+        form = ProvisionParticipantsForm(request.POST)
+        if form.is_valid():
+            experiment = form.cleaned_data['experiment']
+            try:
+                subject_ids = provision_participants(form.cleaned_data['subject_ids'], experiment)
+            except ValidationError as e:
+                # Another request took one of the ids since the form was checked
+                form.add_error('subject_ids', e)
+            else:
+                rows = credential_rows(subject_ids, experiment, request.build_absolute_uri(reverse('participant_login')))
+                response = StreamingHttpResponse(credential_lines(rows), content_type='text/csv')
+                response['Content-Disposition'] = 'attachment; filename=participants.csv'
+                return response
+    else:
+        form = ProvisionParticipantsForm()
+    return render(request, 'provision_participants.html', {'form': form})
+
 # Edit Participant View
 @login_required
 def edit_participant(request, participant_id):
@@ -229,7 +309,7 @@ def edit_participant(request, participant_id):
 def delete_participant(request, participant_id):
     participant = get_object_or_404(Participant, id=participant_id)
     if request.method == 'POST':
-        participant.delete()
+        schedule_deletion(participant)
         return redirect('researcher_dashboard')
     return render(request, 'delete_participant.html', {'participant': participant})
 
@@ -245,6 +325,63 @@ def create_trial(request):
         form = TrialForm()
     return render(request, 'create_trial.html', {'form': form})
 
+# Bulk Trial Import View
+@login_required
+def import_trials_view(request):
+    report = None
+    if request.method == 'POST':
+        form = TrialImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            report = import_trials(
+                io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''),
+                fmt=detect_format(upload.name),
+                experiment=form.cleaned_data['experiment'],
+                replace=form.cleaned_data['replace'],
+                skip_invalid=form.cleaned_data['skip_invalid']
+            )
+    else:
+        form = TrialImportForm()
+    return render(request, 'import_trials.html', {'form': form, 'report': report})
+
+# Stimulus Assets View - upload images and audio for trials to use
+@login_required
+def stimulus_assets(request):
+    stored = []
+    if request.method == 'POST':
+        form = StimulusAssetForm(request.POST, request.FILES)
+        if form.is_valid():
+            for upload in form.cleaned_data['files']:
+                try:
+                    stored.append(store_asset(upload))
+                except ValidationError as e:
+                    form.add_error('files', e)
+    else:
+        form = StimulusAssetForm()
+    assets = StimulusAsset.objects.annotate(trial_count=Count('trials')).order_by('-id')[:100]
+    return render(request, 'stimulus_assets.html', {'form': form, 'stored': stored, 'assets': assets})
+
+# Stimulus Asset View - content-addressed files, cached by browsers for good
+def stimulus_asset(request, file_name):
+    etag = f'"{file_name}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    else:
+        opened = open_asset(file_name)
+        if opened is None:
+            raise Http404
+        response = FileResponse(opened[0], content_type=opened[1])
+    response['Cache-Control'] = ASSET_CACHE_CONTROL
+    response['ETag'] = etag
+    return response
+
+# Static File View - content-hashed names from collectstatic never change, so browsers keep them
+def static_file(request, path):
+    response = serve(request, path, document_root=settings.STATIC_ROOT)
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    response['Cache-Control'] = ASSET_CACHE_CONTROL if path in hashed_files.values() else 'public, max-age=300'
+    return response
+
 # Edit Trial View
 @login_required
 def edit_trial(request, trial_id):
@@ -262,24 +399,88 @@ def edit_trial(request, trial_id):
 @login_required
 def delete_trial(request, trial_id):
     trial = get_object_or_404(Trial, id=trial_id)
-    if request.method == 'POST':
+    # Archived responses keep their trial ids, so those trials must stay
+    archived = ResponseArchive.objects.filter(experiment_id=trial.experiment_id).exists()
+    if request.method == 'POST' and not archived:
         trial.delete()
         return redirect('researcher_dashboard')
-    return render(request, 'delete_trial.html', {'trial': trial})
+    return render(request, 'delete_trial.html', {'trial': trial, 'archived': archived})
 
-# CSV Export View - Download All Results as Zip
+# CSV Export View - Download All Results as Zip, streamed as it is built
 @login_required
 def download_responses_csv(request):
-    results_dir = os.path.join(settings.BASE_DIR, 'experiment_results')
-    files = os.listdir(results_dir)
+    dates = {}
+    for key in ('start', 'end'):
+        value = request.GET.get(key)
+        try:
+            dates[key] = parse_date(value) if value else None
+        except ValueError:
+            dates[key] = None
+        if value and dates[key] is None:
+            return HttpResponseBadRequest('Dates must be given as YYYY-MM-DD')
+
+    storage = results_storage()
+    manifest = refresh_manifest(storage)
+    names = select_result_files(
+        manifest,
+        experiment_id=request.GET.get('experiment'),
+        start_date=dates['start'],
+        end_date=dates['end']
+    )
     zip_filename = "all_responses.zip"
+    response = StreamingHttpResponse(zip_stream(storage, manifest, names), content_type="application/zip")
+    response['Content-Disposition'] = f'attachment; filename={zip_filename}'
+    return response
+
+# Streaming CSV Export View - one experiment's responses, generated while sent
+@login_required
+def export_experiment_responses(request, experiment_id):
+    experiment = get_object_or_404(Experiment, id=experiment_id)
+    rows = response_rows(experiment.pk, live_only=True)
+    response = StreamingHttpResponse(csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename=experiment_results_{experiment.experiment_id}.csv'
+    return response
+
+# Experiment Analytics View
+@login_required
+def experiment_analytics(request, experiment_id):
+    experiment = get_object_or_404(Experiment, id=experiment_id)
+    return render(request, 'experiment_analytics.html', {
+        'experiment': experiment,
+        'summary': summarize_experiment(experiment),
+    })
 
-    with zipfile.ZipFile(os.path.join(results_dir, zip_filename), 'w') as zipf:
-        for file in files:
-            zipf.write(os.path.join(results_dir, file), file)
+# Experiment Analytics JSON View
+@login_required
+def experiment_analytics_json(request, experiment_id):
+    experiment = get_object_or_404(Experiment, id=experiment_id)
+    return JsonResponse(summarize_experiment(experiment))
+
+def request_profile_window(request):
+    try:
+        hours = float(request.GET.get('hours', 24))
+    except ValueError:
+        hours = 24
+    # nan and inf would break timedelta; nothing older than the retention period is kept
+    if not math.isfinite(hours):
+        hours = 24
+    hours = min(max(hours, 0), settings.MAAT_INSTRUMENTATION_RETENTION_DAYS * 24)
+    # Include what this process has sampled since its last flush
+    flush()
+    return hours, instrumentation_report(timezone.now() - timedelta(hours=hours))
+
+# Request Profile View - sampled per-view timings and query counts, staff only
+@staff_member_required
+def request_profile(request):
+    hours, report = request_profile_window(request)
+    return render(request, 'request_profile.html', {
+        'hours': hours,
+        'report': report,
+        'sample_rate': settings.MAAT_INSTRUMENTATION_SAMPLE_RATE,
+    })
 
-    zip_path = os.path.join(results_dir, zip_filename)
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type="application/zip")
-        response['Content-Disposition'] = f'attachment; filename={zip_filename}'
-        return response
\ No newline at end of file
+# Request Profile JSON View
+@staff_member_required
+def request_profile_json(request):
+    hours, report = request_profile_window(request)
+    return JsonResponse({'hours': hours, 'views': report})
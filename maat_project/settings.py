@@ -23,10 +23,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-)z7+6a++u6rf$%g9^v%c8d!)wzv#$xdz9$j#e&2ihvgum1rf!n'
 
+# MAAT_PROFILE=production turns off DEBUG, renders trial pages from
+# pre-rendered shells (maat_app.rendering) with the cached template loader,
+# and serves content-hashed static files (run collectstatic) with far-future
+# caching. Set MAAT_ALLOWED_HOSTS to a comma separated list of host names.
+MAAT_PROFILE = os.environ.get('MAAT_PROFILE', 'development')
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = MAAT_PROFILE != 'production'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('MAAT_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -42,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'maat_app.instrumentation.InstrumentationMiddleware',
+    'maat_app.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,8 +64,8 @@ ROOT_URLCONF = 'maat_project.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates', BASE_DIR / 'templates' / 'maat_app'],
+        'APP_DIRS': MAAT_PROFILE != 'production',
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -69,20 +77,126 @@ TEMPLATES = [
     },
 ]
 
+if MAAT_PROFILE == 'production':
+    # Templates are read and compiled once per process; changes need a restart
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'maat_project.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# MAAT_DB_ENGINE selects the database profile: 'sqlite' (default) or 'postgres'.
+# The PostgreSQL profile needs psycopg installed and reads MAAT_DB_* variables;
+# for pooling beyond persistent connections, point MAAT_DB_HOST at pgbouncer.
+MAAT_DB_ENGINE = os.environ.get('MAAT_DB_ENGINE', 'sqlite')
+
+if MAAT_DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('MAAT_DB_NAME', 'maat'),
+            'USER': os.environ.get('MAAT_DB_USER', 'maat'),
+            'PASSWORD': os.environ.get('MAAT_DB_PASSWORD', ''),
+            'HOST': os.environ.get('MAAT_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('MAAT_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('MAAT_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': 20,
+            },
+        }
+    }
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# single writer, and NORMAL sync is durable across app crashes in WAL mode
+MAAT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/ref/settings/#caches
+
+# MAAT_CACHE_BACKEND selects where caches and sessions live:
+#   'locmem' (default)  memory of each process; only for a single process
+#   'file'              files under MAAT_CACHE_LOCATION (default BASE_DIR/cache),
+#                       shared by the worker processes of one host
+#   'redis'             a Redis-compatible server at MAAT_CACHE_LOCATION
+#                       (redis://host:6379/0), shared by several hosts; needs
+#                       the redis package installed
+# Run state, dashboard fragments and metadata invalidation (maat_app.runs,
+# maat_app.dashboard, maat_app.metadata) reach every process only with a
+# shared backend. Several hosts also need the postgres database profile.
+MAAT_CACHE_BACKEND = os.environ.get('MAAT_CACHE_BACKEND', 'locmem')
+
+if MAAT_CACHE_BACKEND == 'redis':
+    MAAT_CACHE_LOCATION = os.environ.get('MAAT_CACHE_LOCATION', 'redis://localhost:6379/0')
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': MAAT_CACHE_LOCATION,
+            'KEY_PREFIX': alias,
+        }
+        for alias in ('default', 'metadata', 'sessions')
+    }
+elif MAAT_CACHE_BACKEND == 'file':
+    MAAT_CACHE_LOCATION = Path(os.environ.get('MAAT_CACHE_LOCATION', BASE_DIR / 'cache'))
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': MAAT_CACHE_LOCATION / alias,
+            # Every set past MAX_ENTRIES culls a third of the directory
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+        for alias in ('default', 'metadata', 'sessions')
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # LocMemCache evicts the least recently used entries past MAX_ENTRIES
+        # and is per process, so another process sees an edit only after
+        # TIMEOUT seconds
+        'metadata': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'maat-metadata',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# Experiments, participants and trial sets read by the participant hot path
+# (maat_app.metadata); signal handlers drop edited entries
+CACHES['metadata']['TIMEOUT'] = 300
+MAAT_METADATA_CACHE = 'metadata'
+
+# Sessions are stored in the database. With a shared cache they are also
+# read through it, so a participant's requests find the same session on
+# any worker without a query, and survive a cache restart
+if 'sessions' in CACHES:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessions'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -119,10 +233,80 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Production names files after their content (css/style.3f2a….css), so they can be cached forever
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.ManifestStaticFilesStorage' if MAAT_PROFILE == 'production'
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+    # Content-addressed stimulus images and audio (maat_app.assets)
+    'stimulus_assets': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': os.environ.get('MAAT_ASSETS_DIR', BASE_DIR / 'stimulus_assets')},
+    },
+    # Result CSVs written by the export worker and zipped by
+    # download_responses_csv (maat_app.exports)
+    'results': {
+        'BACKEND': 'maat_app.storage.AtomicFileSystemStorage',
+        'OPTIONS': {'location': os.environ.get('MAAT_RESULTS_DIR', BASE_DIR / 'experiment_results')},
+    },
+}
+# With several hosts, point MAAT_ASSETS_DIR and MAAT_RESULTS_DIR at a shared
+# mount, or replace these backends with object storage (e.g. django-storages'
+# S3Storage); the app only uses the Storage API on them
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Static Root
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
\ No newline at end of file
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+# Serve STATIC_ROOT from Django (runserver already does so with DEBUG on);
+# set MAAT_SERVE_STATIC=0 when a front-end web server serves /static/ itself
+MAAT_SERVE_STATIC = MAAT_PROFILE == 'production' and os.environ.get('MAAT_SERVE_STATIC', '1') == '1'
+
+# An export job still running this long after it was claimed is taken to be
+# abandoned (its worker was killed) and queued again
+MAAT_EXPORT_STALE_SECONDS = 30 * 60
+
+# Number of responses the batched trial runner buffers before each bulk POST
+MAAT_RESPONSE_BATCH_SIZE = 20
+
+# Precomputed trial schedules per experiment, rounded up to a multiple of the
+# Latin square rows when blocks are counterbalanced
+MAAT_SCHEDULES_PER_EXPERIMENT = 32
+
+# Largest stimulus image or audio file researchers can upload
+MAAT_ASSET_MAX_BYTES = 20 * 1024 * 1024
+
+# Most participants one bulk provisioning request or command may register
+MAAT_PROVISION_MAX_PARTICIPANTS = 10000
+
+# Rows the deletion worker removes per DELETE statement (each in its own
+# transaction, so writers wait at most one batch), and the pause between batches
+MAAT_DELETION_BATCH_SIZE = 500
+MAAT_DELETION_PAUSE_SECONDS = 0.05
+# A running deletion whose worker has not reported progress for this long
+# is taken to be abandoned (the worker was killed) and queued again
+MAAT_DELETION_STALE_SECONDS = 600
+
+# Route the participant hot path (login, run_trial, save_response,
+# experiment_complete) to the async views; only useful when served over ASGI
+MAAT_ASYNC_VIEWS = os.environ.get('MAAT_ASYNC_VIEWS', '') == '1'
+
+# Share of requests the instrumentation middleware samples (0 disables it).
+# Sampled requests are buffered in memory (oldest dropped beyond the buffer
+# size) and stored as per-view RequestProfile rows every FLUSH_SIZE samples
+# or FLUSH_SECONDS, whichever comes first
+MAAT_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('MAAT_INSTRUMENTATION_SAMPLE_RATE', '0.05'))
+MAAT_INSTRUMENTATION_BUFFER_SIZE = 10000
+MAAT_INSTRUMENTATION_FLUSH_SIZE = 500
+MAAT_INSTRUMENTATION_FLUSH_SECONDS = 60
+MAAT_INSTRUMENTATION_RETENTION_DAYS = 7
@@ -14,10 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from maat_app.views import static_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('maat_app.urls')),
-]
\ No newline at end of file
+]
+
+if settings.MAAT_SERVE_STATIC:
+    urlpatterns.append(re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', static_file))
\ No newline at end of file